@@ -3,10 +3,49 @@ Módulo de Classificação de Atividades
 Analisa padrões de movimento para classificar atividades
 """
 
+import math
+
 import numpy as np
 from typing import List, Dict, Tuple
-from collections import deque
-from scipy.spatial.distance import euclidean
+from numba import njit
+from scipy.spatial import cKDTree
+
+from ring_buffer import RingBuf1D, RingBuf2D
+
+
+@njit(cache=True)
+def _erratic_kernel(positions: np.ndarray, window: int,
+                    cos_threshold: float, changes_needed: int) -> bool:
+    """Conta mudanças bruscas de direção em uma trajetória (compilado com Numba)"""
+    n = positions.shape[0]
+    changes = 0
+
+    for i in range(n - 2 * window):
+        # Deslocamento na primeira janela
+        d1x = positions[i + window - 1, 0] - positions[i, 0]
+        d1y = positions[i + window - 1, 1] - positions[i, 1]
+
+        # Deslocamento na segunda janela
+        d2x = positions[i + 2 * window - 1, 0] - positions[i + window, 0]
+        d2y = positions[i + 2 * window - 1, 1] - positions[i + window, 1]
+
+        len1_2 = d1x * d1x + d1y * d1y
+        len2_2 = d2x * d2x + d2y * d2y
+
+        # Ignorar janelas praticamente sem deslocamento
+        if len1_2 < 1e-12 or len2_2 < 1e-12:
+            continue
+
+        # Comparar o cosseno do ângulo entre os deslocamentos com o cosseno
+        # do threshold: evita atan2/degrees por janela
+        cos_diff = (d1x * d2x + d1y * d2y) / math.sqrt(len1_2 * len2_2)
+
+        if cos_diff < cos_threshold:
+            changes += 1
+            if changes >= changes_needed:
+                return True
+
+    return False
 
 
 class ActivityClassifier:
@@ -20,6 +59,17 @@ class ActivityClassifier:
         'INTERAGINDO': 'Proximidade entre múltiplas pessoas',
         'COMPORTAMENTO_ERRATICO': 'Mudanças bruscas de direção ou movimento irregular'
     }
+
+    # Codificação int8 das atividades para armazenar histórico compacto
+    _ACT_TO_CODE = {
+        'PARADO': 0,
+        'CAMINHANDO': 1,
+        'CORRENDO': 2,
+        'INTERAGINDO': 3,
+        'COMPORTAMENTO_ERRATICO': 4
+    }
+    _CODE_TO_ACT = ('PARADO', 'CAMINHANDO', 'CORRENDO', 'INTERAGINDO',
+                    'COMPORTAMENTO_ERRATICO')
     
     def __init__(self, frame_rate: float = 30.0):
         """
@@ -29,8 +79,8 @@ class ActivityClassifier:
             frame_rate: Taxa de frames do vídeo (fps)
         """
         self.frame_rate = frame_rate
-        self.activity_history = {}  # {track_id: deque de atividades}
-        self.position_history = {}  # {track_id: deque de posições}
+        self.activity_history = {}  # {track_id: RingBuf1D de códigos de atividade}
+        self.position_history = {}  # {track_id: RingBuf2D de posições}
         self.history_size = 30
         
         # Thresholds calibrados
@@ -42,6 +92,29 @@ class ActivityClassifier:
             'direction_change': 45.0,    # graus
             'erratic_changes': 3         # mudanças em janela
         }
+
+        # Thresholds ao quadrado para comparar sem calcular raiz quadrada
+        self._stopped_speed2 = self.thresholds['stopped_speed'] ** 2
+        self._walking_speed2 = self.thresholds['walking_speed'] ** 2
+        self._running_speed2 = self.thresholds['running_speed'] ** 2
+
+        # Cosseno do threshold de mudança de direção, calculado uma vez
+        self._cos_direction_change = math.cos(
+            math.radians(self.thresholds['direction_change'])
+        )
+
+        # Aquecer o kernel JIT uma vez para não pagar compilação no primeiro frame
+        _erratic_kernel(np.zeros((10, 2), dtype=np.float32), 5,
+                        self._cos_direction_change,
+                        self.thresholds['erratic_changes'])
+
+        # Buffers SoA reutilizados entre frames por _frame_arrays
+        self._soa_capacity = 0
+        self._ids_buf = np.empty(0, dtype=np.int64)
+        self._class_ids_buf = np.empty(0, dtype=np.int32)
+        self._bbox_buf = np.empty((0, 4), dtype=np.float32)
+        self._vel_buf = np.empty((0, 2), dtype=np.float32)
+        self._centers_buf = np.empty((0, 2), dtype=np.float32)
     
     def classify(self, tracks: List[Dict], frame_number: int) -> Dict[int, str]:
         """
@@ -55,147 +128,131 @@ class ActivityClassifier:
             Dicionário {track_id: atividade}
         """
         activities = {}
-        
+
+        # Converter tracks para arrays por frame (SoA)
+        ids, class_ids, bboxes, velocities, centers = self._frame_arrays(tracks)
+
         # Atualizar histórico de posições
-        self._update_position_history(tracks)
-        
+        self._update_position_history(tracks, centers)
+
+        # Conjunto de tracks interagindo calculado uma única vez por frame:
+        # KD-tree devolve só os pares próximos, sem matriz N² de distâncias
+        person_idx = np.where(class_ids == 0)[0]
+        interacting_ids = set()
+        if len(person_idx) > 1:
+            person_centers = centers[person_idx]
+            pairs = cKDTree(person_centers).query_pairs(
+                self.thresholds['interaction_distance'], output_type='ndarray'
+            )
+            if len(pairs):
+                involved = np.unique(pairs)
+                interacting_ids = {int(ids[person_idx[k]]) for k in involved}
+
+        # Classificar atividade individual de cada track
         for track in tracks:
-            track_id = track['id']
-            
-            # Classificar atividade individual
-            activity = self._classify_individual_activity(track)
-            
-            # Verificar interações
-            if activity != 'INTERAGINDO':
-                interaction = self._check_interactions(track, tracks)
-                if interaction:
-                    activity = 'INTERAGINDO'
-            
-            activities[track_id] = activity
-            
-            # Atualizar histórico
-            if track_id not in self.activity_history:
-                self.activity_history[track_id] = deque(maxlen=self.history_size)
-            self.activity_history[track_id].append(activity)
-        
+            activities[track['id']] = self._classify_individual_activity(track)
+
+        # Se duas pessoas estão próximas, AMBAS interagem: marcar em um passo
+        for track_id in interacting_ids:
+            activities[track_id] = 'INTERAGINDO'
+
+        # Atualizar histórico (códigos int8, não strings)
+        for track_id, activity in activities.items():
+            history = self.activity_history.get(track_id)
+            if history is None:
+                history = self.activity_history[track_id] = RingBuf1D(self.history_size)
+            history.push(self._ACT_TO_CODE[activity])
+
         return activities
     
     def _classify_individual_activity(self, track: Dict) -> str:
         """Classifica atividade de um track individual"""
         track_id = track['id']
-        velocity = track.get('velocity', np.array([0.0, 0.0]))
-        speed = np.linalg.norm(velocity)
-        
+        velocity = track.get('velocity')
+        if velocity is None:
+            speed2 = 0.0
+        else:
+            vx, vy = float(velocity[0]), float(velocity[1])
+            speed2 = vx * vx + vy * vy
+
         # Verificar comportamento errático primeiro
         if self._is_erratic_behavior(track_id):
             return 'COMPORTAMENTO_ERRATICO'
-        
-        # Classificar baseado em velocidade
-        if speed < self.thresholds['stopped_speed']:
+
+        # Classificar baseado em velocidade (magnitudes ao quadrado)
+        if speed2 < self._stopped_speed2:
             return 'PARADO'
-        elif speed < self.thresholds['walking_speed']:
+        elif speed2 < self._walking_speed2:
             return 'CAMINHANDO'
-        elif speed >= self.thresholds['running_speed']:
+        elif speed2 >= self._running_speed2:
             return 'CORRENDO'
         else:
             return 'CAMINHANDO'
     
     def _is_erratic_behavior(self, track_id: int) -> bool:
         """Detecta comportamento errático baseado em mudanças de direção"""
-        if track_id not in self.position_history:
+        history = self.position_history.get(track_id)
+        if history is None or len(history) < 10:
             return False
-        
-        positions = list(self.position_history[track_id])
-        if len(positions) < 10:
-            return False
-        
-        # Calcular mudanças de direção
-        direction_changes = 0
-        window_size = 5
-        
-        for i in range(len(positions) - window_size * 2):
-            # Direção na primeira janela
-            dir1 = self._calculate_direction(
-                positions[i:i + window_size]
-            )
-            
-            # Direção na segunda janela
-            dir2 = self._calculate_direction(
-                positions[i + window_size:i + window_size * 2]
-            )
-            
-            if dir1 is not None and dir2 is not None:
-                # Calcular diferença angular
-                angle_diff = abs(self._angle_difference(dir1, dir2))
-                
-                if angle_diff > self.thresholds['direction_change']:
-                    direction_changes += 1
-        
-        return direction_changes >= self.thresholds['erratic_changes']
-    
-    def _check_interactions(self, track: Dict, all_tracks: List[Dict]) -> bool:
-        """Verifica se track está interagindo com outros"""
-        track_center = self._get_center(track['bbox'])
-        
-        for other_track in all_tracks:
-            if other_track['id'] == track['id']:
-                continue
-            
-            # Apenas verificar interações pessoa-pessoa
-            if track['class_id'] != 0 or other_track['class_id'] != 0:
-                continue
-            
-            other_center = self._get_center(other_track['bbox'])
-            distance = euclidean(track_center, other_center)
-            
-            if distance < self.thresholds['interaction_distance']:
-                return True
-        
-        return False
+
+        positions = history.as_array()
+        return bool(_erratic_kernel(
+            positions, 5,
+            self._cos_direction_change,
+            self.thresholds['erratic_changes']
+        ))
     
-    def _update_position_history(self, tracks: List[Dict]):
+    def _update_position_history(self, tracks: List[Dict], centers: np.ndarray):
         """Atualiza histórico de posições"""
-        for track in tracks:
+        for i, track in enumerate(tracks):
             track_id = track['id']
-            center = self._get_center(track['bbox'])
-            
-            if track_id not in self.position_history:
-                self.position_history[track_id] = deque(maxlen=self.history_size)
-            
-            self.position_history[track_id].append(center)
-    
-    @staticmethod
-    def _get_center(bbox: List[float]) -> Tuple[float, float]:
-        """Calcula centro do bbox"""
-        x1, y1, x2, y2 = bbox
-        return ((x1 + x2) / 2, (y1 + y2) / 2)
-    
-    @staticmethod
-    def _calculate_direction(positions: List[Tuple[float, float]]) -> float:
-        """Calcula direção média (em graus) de uma sequência de posições"""
-        if len(positions) < 2:
-            return None
-        
-        # Vetor de deslocamento total
-        start = np.array(positions[0])
-        end = np.array(positions[-1])
-        displacement = end - start
-        
-        if np.linalg.norm(displacement) < 1e-6:
-            return None
-        
-        # Ângulo em graus
-        angle = np.degrees(np.arctan2(displacement[1], displacement[0]))
-        return angle
-    
-    @staticmethod
-    def _angle_difference(angle1: float, angle2: float) -> float:
-        """Calcula diferença entre dois ângulos (0-180 graus)"""
-        diff = abs(angle1 - angle2)
-        if diff > 180:
-            diff = 360 - diff
-        return diff
-    
+
+            history = self.position_history.get(track_id)
+            if history is None:
+                history = self.position_history[track_id] = RingBuf2D(self.history_size)
+
+            history.push(centers[i, 0], centers[i, 1])
+
+    def _frame_arrays(self, tracks: List[Dict]) -> Tuple[np.ndarray, np.ndarray,
+                                                          np.ndarray, np.ndarray,
+                                                          np.ndarray]:
+        """Converte a lista de tracks (AoS) em arrays NumPy por frame (SoA)
+
+        Os arrays devolvidos são views de buffers reutilizados entre frames
+        (realocados só quando o número de tracks cresce): válidos apenas até
+        a próxima chamada.
+        """
+        n = len(tracks)
+        if n > self._soa_capacity:
+            capacity = max(n, 2 * self._soa_capacity)
+            self._soa_capacity = capacity
+            self._ids_buf = np.empty(capacity, dtype=np.int64)
+            self._class_ids_buf = np.empty(capacity, dtype=np.int32)
+            self._bbox_buf = np.empty((capacity, 4), dtype=np.float32)
+            self._vel_buf = np.empty((capacity, 2), dtype=np.float32)
+            self._centers_buf = np.empty((capacity, 2), dtype=np.float32)
+
+        ids = self._ids_buf[:n]
+        class_ids = self._class_ids_buf[:n]
+        bboxes = self._bbox_buf[:n]
+        velocities = self._vel_buf[:n]
+        centers = self._centers_buf[:n]
+
+        for i, track in enumerate(tracks):
+            ids[i] = track['id']
+            class_ids[i] = track['class_id']
+            bboxes[i] = track['bbox']
+            velocity = track.get('velocity')
+            if velocity is not None:
+                velocities[i] = velocity
+            else:
+                velocities[i] = 0.0
+
+        # Centros de todos os bboxes em uma única operação, sem alocação
+        np.add(bboxes[:, :2], bboxes[:, 2:], out=centers)
+        centers *= 0.5
+        return ids, class_ids, bboxes, velocities, centers
+
     def get_activity_statistics(self) -> Dict:
         """Retorna estatísticas de atividades ao longo do tempo"""
         stats = {
@@ -203,30 +260,34 @@ class ActivityClassifier:
             'activity_counts': {},
             'track_activities': {}
         }
-        
-        # Contar ocorrências de cada atividade
-        for activity in self.ACTIVITIES.keys():
-            stats['activity_counts'][activity] = 0
-        
-        # Processar histórico
-        for track_id, activities in self.activity_history.items():
-            activity_list = list(activities)
-            
+
+        # Acumulador global vetorial: somado por track, convertido em dict
+        # uma única vez no final (uma passada por histórico, não três)
+        global_counts = np.zeros(len(self._CODE_TO_ACT), dtype=np.int64)
+
+        # Processar histórico (contagem vetorizada via bincount)
+        for track_id, history in self.activity_history.items():
+            codes = history.as_array()
+            if len(codes) == 0:
+                continue
+
+            counts = np.bincount(codes, minlength=len(self._CODE_TO_ACT))
+            global_counts += counts
+            total = int(counts.sum())
+            present = np.nonzero(counts)[0]
+
             # Atividade mais frequente para este track
-            if activity_list:
-                most_common = max(set(activity_list), key=activity_list.count)
-                stats['track_activities'][track_id] = {
-                    'most_common': most_common,
-                    'distribution': {
-                        activity: activity_list.count(activity) / len(activity_list)
-                        for activity in set(activity_list)
-                    }
+            stats['track_activities'][track_id] = {
+                'most_common': self._CODE_TO_ACT[int(counts.argmax())],
+                'distribution': {
+                    self._CODE_TO_ACT[c]: counts[c] / total for c in present
                 }
-                
-                # Contar para estatísticas gerais
-                for activity in activity_list:
-                    stats['activity_counts'][activity] += 1
-        
+            }
+
+        stats['activity_counts'] = {
+            act: int(global_counts[c]) for c, act in enumerate(self._CODE_TO_ACT)
+        }
+
         return stats
     
     def get_activity_description(self, activity: str) -> str:
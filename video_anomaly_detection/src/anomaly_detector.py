@@ -4,10 +4,29 @@ Identifica comportamentos atípicos e eventos anormais
 """
 
 import numpy as np
-from typing import List, Dict, Tuple, Optional
-from collections import deque, defaultdict
-from scipy.spatial.distance import euclidean
-import time
+import math
+
+from typing import List, Dict, Tuple
+from collections import Counter, defaultdict
+from scipy.spatial import cKDTree
+
+from ring_buffer import RingBuf2D
+
+
+class _TrackState:
+    """Estado por track com __slots__: sem dict por instância nem hash de
+    chave a cada acesso nos _check_* por frame"""
+
+    __slots__ = ('initial_position', 'current_position', 'max_distance',
+                 'first_seen', 'last_seen', 'stopped_since')
+
+    def __init__(self, center: Tuple[float, float], timestamp: float):
+        self.initial_position = center
+        self.current_position = center
+        self.max_distance = 0.0
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.stopped_since = math.inf  # inf = em movimento
 
 
 class AnomalyDetector:
@@ -57,6 +76,11 @@ class AnomalyDetector:
         self.frame_rate = frame_rate
         self.anomalies = []  # Lista de todas as anomalias detectadas
         self.track_states = {}  # Estado de cada track
+
+        # Estatísticas mantidas incrementalmente a cada detecção
+        self._by_type = Counter()
+        self._by_severity = Counter()
+        self._timeline = []
         
         # Thresholds para detecção
         self.thresholds = {
@@ -68,10 +92,30 @@ class AnomalyDetector:
             'return_threshold': 50.0,      # pixels do ponto inicial
             'object_abandoned_time': 10.0, # segundos
         }
+
+        # Thresholds ao quadrado para comparar sem calcular raiz quadrada
+        self._high_speed2 = self.thresholds['high_speed'] ** 2
+        self._sudden_acceleration2 = self.thresholds['sudden_acceleration'] ** 2
+        self._return_threshold2 = self.thresholds['return_threshold'] ** 2
+
+        # Cache (descrição, severidade) por tipo para montar anomalias sem
+        # reindexar o dict aninhado a cada registro
+        self._anom_info = {
+            k: (v['description'], v['severity'])
+            for k, v in self.ANOMALY_TYPES.items()
+        }
         
-        # Histórico de velocidades
+        # Histórico de velocidades (um RingBuf2D por track)
         self.velocity_history = {}
         self.history_size = 10
+
+        # Buffers SoA reutilizados entre frames por _frame_arrays
+        self._soa_capacity = 0
+        self._ids_buf = np.empty(0, dtype=np.int64)
+        self._class_ids_buf = np.empty(0, dtype=np.int32)
+        self._bbox_buf = np.empty((0, 4), dtype=np.float32)
+        self._vel_buf = np.empty((0, 2), dtype=np.float32)
+        self._centers_buf = np.empty((0, 2), dtype=np.float32)
         
     def detect(self, tracks: List[Dict], activities: Dict[int, str], 
                frame_number: int, timestamp: float) -> List[Dict]:
@@ -88,284 +132,287 @@ class AnomalyDetector:
             Lista de anomalias detectadas neste frame
         """
         frame_anomalies = []
-        
+        n = len(tracks)
+
+        # Converter tracks para arrays por frame (SoA)
+        ids, class_ids, bboxes, velocities, centers = self._frame_arrays(tracks)
+
         # Inicializar estado dos tracks
-        self._update_track_states(tracks, timestamp)
-        
-        for track in tracks:
-            track_id = track['id']
-            
-            # 1. Verificar movimento súbito
-            if self._check_sudden_movement(track_id):
-                frame_anomalies.append(self._create_anomaly(
-                    'MOVIMENTO_SUBITO', track, frame_number, timestamp
-                ))
-            
-            # 2. Verificar velocidade anormal
-            if self._check_high_speed(track):
-                frame_anomalies.append(self._create_anomaly(
-                    'VELOCIDADE_ANORMAL', track, frame_number, timestamp
-                ))
-            
-            # 3. Verificar parada prolongada
-            if self._check_prolonged_stop(track_id, activities.get(track_id)):
-                frame_anomalies.append(self._create_anomaly(
-                    'PARADA_PROLONGADA', track, frame_number, timestamp
-                ))
-            
-            # 4. Verificar movimento reverso
-            if self._check_reverse_movement(track_id):
-                frame_anomalies.append(self._create_anomaly(
-                    'MOVIMENTO_REVERSO', track, frame_number, timestamp
-                ))
-            
-            # 5. Verificar objeto abandonado
-            if self._check_abandoned_object(track, activities.get(track_id)):
-                frame_anomalies.append(self._create_anomaly(
-                    'OBJETO_ABANDONADO', track, frame_number, timestamp
-                ))
-        
+        self._update_track_states(tracks, centers, velocities, timestamp)
+
+        if n:
+            # Arrays de estado coletados em uma única passada
+            states = [self.track_states[t['id']] for t in tracks]
+            stopped_since = np.fromiter(
+                (s.stopped_since for s in states), dtype=np.float64, count=n
+            )
+            max_distances = np.fromiter(
+                (s.max_distance for s in states), dtype=np.float64, count=n
+            )
+            initials = np.asarray(
+                [s.initial_position for s in states], dtype=np.float32
+            )
+            parado = np.fromiter(
+                (activities.get(t['id']) == 'PARADO' for t in tracks),
+                dtype=bool, count=n
+            )
+
+            # 1. Movimento súbito (kernel por track sobre o ring buffer)
+            sudden_mask = np.fromiter(
+                (self._check_sudden_movement(t['id']) for t in tracks),
+                dtype=bool, count=n
+            )
+
+            # 2. Velocidade anormal (magnitudes ao quadrado, sem sqrt)
+            speeds2 = (velocities * velocities).sum(axis=1)
+            high_speed_mask = speeds2 > self._high_speed2
+
+            # 3/5. Parada prolongada e objeto abandonado: stopped_since guarda
+            # tempo de vídeo (inf enquanto em movimento, tornando a duração
+            # -inf e o teste falso sem checar sentinela)
+            stop_durations = timestamp - stopped_since
+            prolonged_mask = parado & (
+                stop_durations > self.thresholds['stopped_duration']
+            )
+            abandoned_mask = parado & (class_ids != 0) & (
+                stop_durations > self.thresholds['object_abandoned_time']
+            )
+
+            # 4. Movimento reverso: perto do ponto inicial depois de ter se
+            # afastado (distâncias ao quadrado em lote)
+            deltas = centers - initials
+            dist2 = (deltas * deltas).sum(axis=1)
+            reverse_mask = (dist2 < self._return_threshold2) & (
+                max_distances > self.thresholds['return_threshold'] * 2
+            )
+
+            # Construir anomalias apenas para os índices que passaram
+            for anomaly_type, mask in (
+                ('MOVIMENTO_SUBITO', sudden_mask),
+                ('VELOCIDADE_ANORMAL', high_speed_mask),
+                ('PARADA_PROLONGADA', prolonged_mask),
+                ('MOVIMENTO_REVERSO', reverse_mask),
+                ('OBJETO_ABANDONADO', abandoned_mask),
+            ):
+                frame_anomalies.extend(
+                    self._create_anomaly(anomaly_type, tracks[i], centers[i],
+                                         frame_number, timestamp)
+                    for i in np.where(mask)[0]
+                )
+
         # 6. Verificar aglomeração
-        crowding_anomalies = self._check_crowding(tracks, frame_number, timestamp)
+        crowding_anomalies = self._check_crowding(
+            tracks, class_ids, centers, frame_number, timestamp
+        )
         frame_anomalies.extend(crowding_anomalies)
         
-        # Adicionar às anomalias totais
+        # Adicionar às anomalias totais e atualizar contadores incrementais
         self.anomalies.extend(frame_anomalies)
-        
+        for anomaly in frame_anomalies:
+            self._by_type[anomaly['type']] += 1
+            self._by_severity[anomaly['severity']] += 1
+            self._timeline.append({
+                'timestamp': anomaly['timestamp'],
+                'type': anomaly['type'],
+                'severity': anomaly['severity']
+            })
+
         return frame_anomalies
     
+    def _frame_arrays(self, tracks: List[Dict]) -> Tuple[np.ndarray, np.ndarray,
+                                                          np.ndarray, np.ndarray,
+                                                          np.ndarray]:
+        """Converte a lista de tracks (AoS) em arrays NumPy por frame (SoA)
+
+        Os arrays devolvidos são views de buffers reutilizados entre frames
+        (realocados só quando o número de tracks cresce): válidos apenas até
+        a próxima chamada.
+        """
+        n = len(tracks)
+        if n > self._soa_capacity:
+            capacity = max(n, 2 * self._soa_capacity)
+            self._soa_capacity = capacity
+            self._ids_buf = np.empty(capacity, dtype=np.int64)
+            self._class_ids_buf = np.empty(capacity, dtype=np.int32)
+            self._bbox_buf = np.empty((capacity, 4), dtype=np.float32)
+            self._vel_buf = np.empty((capacity, 2), dtype=np.float32)
+            self._centers_buf = np.empty((capacity, 2), dtype=np.float32)
+
+        ids = self._ids_buf[:n]
+        class_ids = self._class_ids_buf[:n]
+        bboxes = self._bbox_buf[:n]
+        velocities = self._vel_buf[:n]
+        centers = self._centers_buf[:n]
+
+        for i, track in enumerate(tracks):
+            ids[i] = track['id']
+            class_ids[i] = track['class_id']
+            bboxes[i] = track['bbox']
+            velocity = track.get('velocity')
+            if velocity is not None:
+                velocities[i] = velocity
+            else:
+                velocities[i] = 0.0
+
+        # Centros de todos os bboxes em uma única operação, sem alocação
+        np.add(bboxes[:, :2], bboxes[:, 2:], out=centers)
+        centers *= 0.5
+        return ids, class_ids, bboxes, velocities, centers
+
     def _check_sudden_movement(self, track_id: int) -> bool:
         """Detecta aceleração repentina"""
-        if track_id not in self.velocity_history:
-            return False
-        
-        velocities = list(self.velocity_history[track_id])
-        if len(velocities) < 3:
+        history = self.velocity_history.get(track_id)
+        if history is None or len(history) < 3:
             return False
-        
-        # Calcular acelerações
-        accelerations = []
-        for i in range(len(velocities) - 1):
-            v1 = velocities[i]
-            v2 = velocities[i + 1]
-            accel = np.linalg.norm(v2 - v1)
-            accelerations.append(accel)
-        
-        # Verificar se há aceleração súbita
-        if accelerations:
-            max_accel = max(accelerations)
-            return max_accel > self.thresholds['sudden_acceleration']
-        
-        return False
-    
-    def _check_high_speed(self, track: Dict) -> bool:
-        """Detecta velocidade anormalmente alta"""
-        velocity = track.get('velocity', np.array([0.0, 0.0]))
-        speed = np.linalg.norm(velocity)
-        return speed > self.thresholds['high_speed']
-    
-    def _check_prolonged_stop(self, track_id: int, activity: Optional[str]) -> bool:
-        """Detecta parada prolongada"""
-        if activity != 'PARADO':
-            return False
-        
-        if track_id not in self.track_states:
-            return False
-        
-        state = self.track_states[track_id]
-        if 'stopped_since' not in state:
-            return False
-        
-        stopped_duration = time.time() - state['stopped_since']
-        return stopped_duration > self.thresholds['stopped_duration']
-    
-    def _check_reverse_movement(self, track_id: int) -> bool:
-        """Detecta movimento de retorno ao ponto inicial"""
-        if track_id not in self.track_states:
-            return False
-        
-        state = self.track_states[track_id]
-        if 'initial_position' not in state or 'current_position' not in state:
-            return False
-        
-        # Verificar se voltou próximo ao ponto inicial
-        initial = np.array(state['initial_position'])
-        current = np.array(state['current_position'])
-        
-        distance = np.linalg.norm(current - initial)
-        
-        # Só considera reverso se já se afastou e voltou
-        if 'max_distance' in state:
-            return (distance < self.thresholds['return_threshold'] and 
-                   state['max_distance'] > self.thresholds['return_threshold'] * 2)
-        
-        return False
-    
-    def _check_abandoned_object(self, track: Dict, activity: Optional[str]) -> bool:
-        """Detecta objeto abandonado (não é pessoa e está parado)"""
-        # Apenas para objetos, não pessoas
-        if track['class_id'] == 0:  # 0 = person
-            return False
-        
-        if activity != 'PARADO':
-            return False
-        
-        track_id = track['id']
-        if track_id not in self.track_states:
-            return False
-        
-        state = self.track_states[track_id]
-        if 'stopped_since' not in state:
-            return False
-        
-        stopped_duration = time.time() - state['stopped_since']
-        return stopped_duration > self.thresholds['object_abandoned_time']
-    
-    def _check_crowding(self, tracks: List[Dict], frame_number: int, 
+
+        # Acelerações (magnitude ao quadrado) calculadas de uma vez no buffer
+        velocities = history.as_array()
+        diffs = velocities[1:] - velocities[:-1]
+        accelerations2 = (diffs * diffs).sum(axis=1)
+
+        return bool(accelerations2.max() > self._sudden_acceleration2)
+
+    def _check_crowding(self, tracks: List[Dict], class_ids: np.ndarray,
+                       centers: np.ndarray, frame_number: int,
                        timestamp: float) -> List[Dict]:
         """Detecta aglomerações"""
         anomalies = []
-        
+
         # Filtrar apenas pessoas
-        people = [t for t in tracks if t['class_id'] == 0]
-        
+        people_idx = np.where(class_ids == 0)[0]
+        people = [tracks[i] for i in people_idx]
+
         if len(people) < self.thresholds['crowding_count']:
             return anomalies
-        
-        # Verificar grupos próximos
-        checked = set()
-        
-        for i, person1 in enumerate(people):
-            if person1['id'] in checked:
+
+        # Pares próximos em O(N log N) com KD-tree, sem matriz N² de distâncias
+        centers = centers[people_idx]
+        tree = cKDTree(centers)
+        pairs = tree.query_pairs(self.thresholds['crowding_distance'])
+
+        if not pairs:
+            return anomalies
+
+        # União-busca sobre os pares para formar grupos (componentes conexas)
+        parent = list(range(len(people)))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for a, b in pairs:
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+        groups = defaultdict(list)
+        for i in range(len(people)):
+            groups[find(i)].append(i)
+
+        for group_idx in groups.values():
+            if len(group_idx) < self.thresholds['crowding_count']:
                 continue
-            
-            center1 = self._get_center(person1['bbox'])
-            nearby = [person1]
-            
-            for j, person2 in enumerate(people):
-                if i == j or person2['id'] in checked:
-                    continue
-                
-                center2 = self._get_center(person2['bbox'])
-                distance = euclidean(center1, center2)
-                
-                if distance < self.thresholds['crowding_distance']:
-                    nearby.append(person2)
-            
-            if len(nearby) >= self.thresholds['crowding_count']:
-                # Marcar todos como verificados
-                for person in nearby:
-                    checked.add(person['id'])
-                
-                # Criar anomalia de aglomeração
-                center = np.mean([self._get_center(p['bbox']) for p in nearby], axis=0)
-                
-                anomaly = {
-                    'type': 'AGLOMERACAO',
-                    'description': self.ANOMALY_TYPES['AGLOMERACAO']['description'],
-                    'severity': self.ANOMALY_TYPES['AGLOMERACAO']['severity'],
-                    'frame': frame_number,
-                    'timestamp': timestamp,
-                    'location': tuple(center),
-                    'involved_tracks': [p['id'] for p in nearby],
-                    'count': len(nearby)
-                }
-                
-                anomalies.append(anomaly)
-        
+
+            # Criar anomalia de aglomeração
+            center = centers[group_idx].mean(axis=0)
+            description, severity = self._anom_info['AGLOMERACAO']
+
+            anomaly = {
+                'type': 'AGLOMERACAO',
+                'description': description,
+                'severity': severity,
+                'frame': frame_number,
+                'timestamp': timestamp,
+                'location': (float(center[0]), float(center[1])),
+                'involved_tracks': [people[j]['id'] for j in group_idx],
+                'count': len(group_idx)
+            }
+
+            anomalies.append(anomaly)
+
         return anomalies
     
-    def _update_track_states(self, tracks: List[Dict], timestamp: float):
+    def _update_track_states(self, tracks: List[Dict], centers: np.ndarray,
+                             velocities: np.ndarray, timestamp: float):
         """Atualiza estado de cada track"""
         current_ids = {track['id'] for track in tracks}
-        
-        for track in tracks:
+
+        # Inicializar histórico e estado dos tracks novos
+        for i, track in enumerate(tracks):
             track_id = track['id']
-            velocity = track.get('velocity', np.array([0.0, 0.0]))
-            center = self._get_center(track['bbox'])
-            
-            # Atualizar histórico de velocidades
-            if track_id not in self.velocity_history:
-                self.velocity_history[track_id] = deque(maxlen=self.history_size)
-            self.velocity_history[track_id].append(velocity)
-            
-            # Inicializar estado
+
+            history = self.velocity_history.get(track_id)
+            if history is None:
+                history = self.velocity_history[track_id] = RingBuf2D(self.history_size)
+            history.push(velocities[i, 0], velocities[i, 1])
+
             if track_id not in self.track_states:
-                self.track_states[track_id] = {
-                    'initial_position': center,
-                    'max_distance': 0.0,
-                    'first_seen': timestamp
-                }
-            
-            state = self.track_states[track_id]
-            state['current_position'] = center
-            state['last_seen'] = timestamp
-            
-            # Atualizar distância máxima
-            initial = np.array(state['initial_position'])
-            distance = np.linalg.norm(np.array(center) - initial)
-            state['max_distance'] = max(state['max_distance'], distance)
-            
-            # Verificar se está parado
-            speed = np.linalg.norm(velocity)
-            if speed < 2.0:  # threshold para "parado"
-                if 'stopped_since' not in state:
-                    state['stopped_since'] = timestamp
-            else:
-                if 'stopped_since' in state:
-                    del state['stopped_since']
-        
+                self.track_states[track_id] = _TrackState(
+                    (float(centers[i, 0]), float(centers[i, 1])), timestamp
+                )
+
+        if tracks:
+            # Distâncias ao ponto inicial e flags de parada calculadas
+            # para todos os tracks de uma vez (broadcasting)
+            initials = np.asarray(
+                [self.track_states[t['id']].initial_position for t in tracks],
+                dtype=np.float32
+            )
+            deltas = centers - initials
+            distances = np.sqrt((deltas * deltas).sum(axis=1))
+            speeds2 = (velocities * velocities).sum(axis=1)
+            stopped_mask = speeds2 < 4.0  # threshold para "parado" (2.0 px/frame ao quadrado)
+
+            for i, track in enumerate(tracks):
+                state = self.track_states[track['id']]
+                state.current_position = (float(centers[i, 0]), float(centers[i, 1]))
+                state.last_seen = timestamp
+
+                # Atualizar distância máxima
+                if distances[i] > state.max_distance:
+                    state.max_distance = float(distances[i])
+
+                # Verificar se está parado
+                if stopped_mask[i]:
+                    if state.stopped_since == math.inf:
+                        state.stopped_since = timestamp
+                else:
+                    state.stopped_since = math.inf
+
         # Limpar estados de tracks que não existem mais
         to_remove = [tid for tid in self.track_states if tid not in current_ids]
         for tid in to_remove:
-            if timestamp - self.track_states[tid].get('last_seen', 0) > 5.0:
+            if timestamp - self.track_states[tid].last_seen > 5.0:
                 del self.track_states[tid]
                 if tid in self.velocity_history:
                     del self.velocity_history[tid]
     
-    def _create_anomaly(self, anomaly_type: str, track: Dict, 
+    def _create_anomaly(self, anomaly_type: str, track: Dict, center: np.ndarray,
                        frame_number: int, timestamp: float) -> Dict:
         """Cria registro de anomalia"""
-        info = self.ANOMALY_TYPES[anomaly_type]
-        center = self._get_center(track['bbox'])
-        
+        description, severity = self._anom_info[anomaly_type]
+
         return {
             'type': anomaly_type,
-            'description': info['description'],
-            'severity': info['severity'],
+            'description': description,
+            'severity': severity,
             'frame': frame_number,
             'timestamp': timestamp,
             'track_id': track['id'],
-            'location': tuple(center),
+            'location': (float(center[0]), float(center[1])),
             'bbox': track['bbox']
         }
     
-    @staticmethod
-    def _get_center(bbox: List[float]) -> Tuple[float, float]:
-        """Calcula centro do bbox"""
-        x1, y1, x2, y2 = bbox
-        return ((x1 + x2) / 2, (y1 + y2) / 2)
-    
     def get_statistics(self) -> Dict:
-        """Retorna estatísticas de anomalias"""
-        stats = {
+        """Retorna estatísticas de anomalias (mantidas incrementalmente)"""
+        return {
             'total_anomalies': len(self.anomalies),
-            'by_type': defaultdict(int),
-            'by_severity': defaultdict(int),
-            'timeline': []
+            'by_type': dict(self._by_type),
+            'by_severity': dict(self._by_severity),
+            'timeline': list(self._timeline)
         }
-        
-        for anomaly in self.anomalies:
-            stats['by_type'][anomaly['type']] += 1
-            stats['by_severity'][anomaly['severity']] += 1
-            
-            stats['timeline'].append({
-                'timestamp': anomaly['timestamp'],
-                'type': anomaly['type'],
-                'severity': anomaly['severity']
-            })
-        
-        return dict(stats)
     
     def get_severity_color(self, severity: str) -> Tuple[int, int, int]:
         """Retorna cor BGR para cada nível de severidade"""
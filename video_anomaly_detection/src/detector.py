@@ -4,198 +4,293 @@ Utiliza YOLOv8 para detecção e algoritmo de tracking customizado
 """
 
 import cv2
+import os
 import numpy as np
+import torch
 from ultralytics import YOLO
-from collections import defaultdict, deque
+from scipy.optimize import linear_sum_assignment
+from numba import njit
 from typing import List, Dict, Tuple, Optional
-import time
+
+from ring_buffer import RingBuf2D
+
+
+@njit(cache=True, fastmath=True)
+def _iou_cost_kernel(dets: np.ndarray, det_areas: np.ndarray,
+                     trks: np.ndarray, trk_areas: np.ndarray,
+                     out: np.ndarray):
+    """Preenche out com 1 - IoU para todos os pares (compilado com Numba)
+
+    Para os N, M pequenos típicos (< 30 tracks), um único loop fundido
+    evita os ~6 lançamentos de kernel NumPy e os temporários (N, M) do
+    caminho via broadcasting.
+    """
+    for i in range(dets.shape[0]):
+        for j in range(trks.shape[0]):
+            # Pré-filtro de sobreposição de intervalos: a maioria dos pares
+            # nem se toca, então o custo vira 1.0 direto, sem união nem divisão
+            w = min(dets[i, 2], trks[j, 2]) - max(dets[i, 0], trks[j, 0])
+            if w <= 0.0:
+                out[i, j] = 1.0
+                continue
+            h = min(dets[i, 3], trks[j, 3]) - max(dets[i, 1], trks[j, 1])
+            if h <= 0.0:
+                out[i, j] = 1.0
+                continue
+
+            intersection = w * h
+            union = det_areas[i] + trk_areas[j] - intersection
+
+            iou = intersection / union if union > 0.0 else 0.0
+            out[i, j] = 1.0 - iou
 
 
 class ObjectTracker:
-    """Rastreador de objetos com ID único e histórico de trajetória"""
-    
+    """Rastreador de objetos com ID único e histórico de trajetória
+
+    Estado interno em Structure-of-Arrays: arrays NumPy paralelos indexados
+    por linha, para que associação, envelhecimento e limpeza sejam operações
+    vetorizadas em vez de varreduras de dicts.
+    """
+
     def __init__(self, max_history: int = 30):
-        self.tracks = {}  # {track_id: Track}
         self.next_id = 1
         self.max_history = max_history
         self.max_age = 30  # frames sem detecção antes de remover
-        
+
+        # Arrays paralelos (uma linha por track)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.bboxes = np.empty((0, 4), dtype=np.float32)
+        self.class_ids = np.empty(0, dtype=np.int32)
+        self.confidences = np.empty(0, dtype=np.float32)
+        self.ages = np.empty(0, dtype=np.int32)
+        self.hits = np.empty(0, dtype=np.int32)
+        self.velocities = np.empty((0, 2), dtype=np.float32)
+        self.areas = np.empty(0, dtype=np.float32)  # cache de (x2-x1)*(y2-y1)
+        # Ring buffers int32 de centros, paralelos às linhas: o polyline
+        # da trajetória desenha direto no array, sem converter tuplas
+        self.histories = []
+
+        # Aquecer o kernel JIT uma vez para não pagar compilação no primeiro frame
+        _warm = np.zeros((1, 4), dtype=np.float32)
+        _iou_cost_kernel(_warm, np.zeros(1, dtype=np.float32),
+                         _warm, np.zeros(1, dtype=np.float32),
+                         np.empty((1, 1), dtype=np.float32))
+
     def update(self, detections: List[Dict]) -> List[Dict]:
         """
         Atualiza tracks com novas detecções
-        
+
         Args:
             detections: Lista de detecções [{bbox, confidence, class_id}]
-            
+
         Returns:
             Lista de tracks ativos com IDs
         """
-        if not self.tracks:
+        if len(self.ids) == 0:
             # Primeira iteração - criar novos tracks
             for det in detections:
                 self._create_track(det)
         else:
             # Associar detecções a tracks existentes
             self._associate_detections(detections)
-        
+
         # Remover tracks antigos
         self._cleanup_tracks()
-        
+
         # Retornar tracks ativos
         return self._get_active_tracks()
-    
+
+    def predict(self) -> List[Dict]:
+        """Avança os tracks pela velocidade, sem detecções (frame pulado)
+
+        Usado na subamostragem temporal: desloca cada bbox pelo último
+        vetor de velocidade e devolve os tracks ativos. Idade e hits não
+        mudam — o frame não teve detecção para confirmar nem negar.
+        """
+        if len(self.ids):
+            self.bboxes[:, :2] += self.velocities
+            self.bboxes[:, 2:] += self.velocities
+
+            centers = (self.bboxes[:, :2] + self.bboxes[:, 2:]) * 0.5
+            for row in range(len(self.ids)):
+                self.histories[row].push(centers[row, 0], centers[row, 1])
+
+        return self._get_active_tracks()
+
     def _create_track(self, detection: Dict) -> int:
-        """Cria um novo track"""
+        """Cria um novo track (acrescenta uma linha aos arrays)"""
         track_id = self.next_id
         self.next_id += 1
-        
-        self.tracks[track_id] = {
-            'id': track_id,
-            'bbox': detection['bbox'],
-            'class_id': detection['class_id'],
-            'confidence': detection['confidence'],
-            'history': deque([self._bbox_center(detection['bbox'])], maxlen=self.max_history),
-            'age': 0,
-            'hits': 1,
-            'velocity': np.array([0.0, 0.0]),
-            'last_seen': time.time()
-        }
-        
+
+        bbox = np.asarray(detection['bbox'], dtype=np.float32)
+        self.ids = np.concatenate((self.ids, [track_id]))
+        self.bboxes = np.concatenate((self.bboxes, bbox[None, :]))
+        self.class_ids = np.concatenate(
+            (self.class_ids, np.asarray([detection['class_id']], dtype=np.int32))
+        )
+        self.confidences = np.concatenate(
+            (self.confidences,
+             np.asarray([detection['confidence']], dtype=np.float32))
+        )
+        self.ages = np.concatenate((self.ages, np.zeros(1, dtype=np.int32)))
+        self.hits = np.concatenate((self.hits, np.ones(1, dtype=np.int32)))
+        self.velocities = np.concatenate(
+            (self.velocities, np.zeros((1, 2), dtype=np.float32))
+        )
+        self.areas = np.concatenate(
+            (self.areas, [(bbox[2] - bbox[0]) * (bbox[3] - bbox[1])])
+        )
+        history = RingBuf2D(self.max_history, dtype=np.int32)
+        cx, cy = self._bbox_center(detection['bbox'])
+        history.push(cx, cy)
+        self.histories.append(history)
+
         return track_id
-    
+
     def _associate_detections(self, detections: List[Dict]):
         """Associa detecções a tracks existentes usando IoU"""
         if not detections:
-            # Incrementar idade de todos os tracks
-            for track in self.tracks.values():
-                track['age'] += 1
+            # Incrementar idade de todos os tracks (vetorizado)
+            self.ages += 1
             return
-        
-        # Calcular matriz de custos (1 - IoU)
-        track_ids = list(self.tracks.keys())
-        cost_matrix = np.zeros((len(detections), len(track_ids)))
-        
-        for i, det in enumerate(detections):
-            for j, track_id in enumerate(track_ids):
-                track = self.tracks[track_id]
-                iou = self._calculate_iou(det['bbox'], track['bbox'])
-                cost_matrix[i, j] = 1 - iou
-        
-        # Associação simples: menor custo
-        matched_tracks = set()
-        matched_detections = set()
-        
-        # Ordenar por menor custo
-        flat_costs = []
-        for i in range(len(detections)):
-            for j in range(len(track_ids)):
-                flat_costs.append((cost_matrix[i, j], i, j))
-        flat_costs.sort()
-        
-        for cost, det_idx, track_idx in flat_costs:
-            if det_idx in matched_detections or track_idx in matched_tracks:
-                continue
-            if cost < 0.7:  # Threshold de IoU mínimo
-                track_id = track_ids[track_idx]
-                self._update_track(track_id, detections[det_idx])
-                matched_tracks.add(track_idx)
-                matched_detections.add(det_idx)
-        
+
+        # Calcular matriz de custos (1 - IoU) com o kernel JIT fundido
+        det_arr = np.asarray([det['bbox'] for det in detections], dtype=np.float32)
+        det_areas = ((det_arr[:, 2] - det_arr[:, 0]) *
+                     (det_arr[:, 3] - det_arr[:, 1]))
+        cost_matrix = np.empty((len(detections), len(self.ids)), dtype=np.float32)
+        _iou_cost_kernel(det_arr, det_areas, self.bboxes, self.areas, cost_matrix)
+
+        # Associação ótima (algoritmo húngaro) em vez da varredura gulosa
+        # ordenada: custos acima do threshold viram proibitivos para que o
+        # solver não force pares sem sobreposição suficiente
+        cost_matrix[cost_matrix >= 0.7] = 1e6
+        row_ind, col_ind = linear_sum_assignment(cost_matrix)
+
+        feasible = cost_matrix[row_ind, col_ind] < 0.7  # Threshold de IoU mínimo
+        det_rows = row_ind[feasible]
+        trk_rows = col_ind[feasible]
+
+        # Envelhecer todos e zerar só os associados: sem loop de não-associados
+        self.ages += 1
+
+        if len(det_rows):
+            new_bboxes = det_arr[det_rows]
+            old_centers = (self.bboxes[trk_rows, :2] +
+                           self.bboxes[trk_rows, 2:]) * 0.5
+            new_centers = (new_bboxes[:, :2] + new_bboxes[:, 2:]) * 0.5
+
+            self.velocities[trk_rows] = new_centers - old_centers
+            self.bboxes[trk_rows] = new_bboxes
+            self.areas[trk_rows] = ((new_bboxes[:, 2] - new_bboxes[:, 0]) *
+                                    (new_bboxes[:, 3] - new_bboxes[:, 1]))
+            self.confidences[trk_rows] = [
+                detections[i]['confidence'] for i in det_rows
+            ]
+            self.ages[trk_rows] = 0
+            self.hits[trk_rows] += 1
+
+            for row, center in zip(trk_rows, new_centers):
+                self.histories[row].push(center[0], center[1])
+
         # Criar novos tracks para detecções não associadas
+        matched_detections = set(det_rows.tolist())
         for i, det in enumerate(detections):
             if i not in matched_detections:
                 self._create_track(det)
-        
-        # Incrementar idade dos tracks não associados
-        for j, track_id in enumerate(track_ids):
-            if j not in matched_tracks:
-                self.tracks[track_id]['age'] += 1
-    
-    def _update_track(self, track_id: int, detection: Dict):
-        """Atualiza um track existente"""
-        track = self.tracks[track_id]
-        
-        # Calcular velocidade
-        old_center = self._bbox_center(track['bbox'])
-        new_center = self._bbox_center(detection['bbox'])
-        velocity = np.array(new_center) - np.array(old_center)
-        
-        # Atualizar track
-        track['bbox'] = detection['bbox']
-        track['confidence'] = detection['confidence']
-        track['history'].append(new_center)
-        track['age'] = 0
-        track['hits'] += 1
-        track['velocity'] = velocity
-        track['last_seen'] = time.time()
-    
+
     def _cleanup_tracks(self):
-        """Remove tracks muito antigos"""
-        to_remove = []
-        for track_id, track in self.tracks.items():
-            if track['age'] > self.max_age:
-                to_remove.append(track_id)
-        
-        for track_id in to_remove:
-            del self.tracks[track_id]
-    
+        """Remove tracks muito antigos (filtro vetorizado nas linhas)"""
+        keep = self.ages <= self.max_age
+        if keep.all():
+            return
+
+        self.ids = self.ids[keep]
+        self.bboxes = self.bboxes[keep]
+        self.class_ids = self.class_ids[keep]
+        self.confidences = self.confidences[keep]
+        self.ages = self.ages[keep]
+        self.hits = self.hits[keep]
+        self.velocities = self.velocities[keep]
+        self.areas = self.areas[keep]
+        self.histories = [h for h, k in zip(self.histories, keep) if k]
+
     def _get_active_tracks(self) -> List[Dict]:
-        """Retorna apenas tracks ativos"""
+        """Retorna apenas tracks ativos
+
+        bbox e velocity são cópias, não views: no processamento em lote o
+        tracker avança vários frames antes de os consumidores lerem os
+        dicts, e uma view refletiria o estado do fim do lote em todos eles.
+        """
         active = []
-        for track in self.tracks.values():
-            if track['hits'] >= 3:  # Mínimo de hits para considerar válido
-                active.append(track)
+        for i in np.where(self.hits >= 3)[0]:  # Mínimo de hits para considerar válido
+            active.append({
+                'id': int(self.ids[i]),
+                'bbox': self.bboxes[i].copy(),
+                'class_id': int(self.class_ids[i]),
+                'confidence': float(self.confidences[i]),
+                'history': self.histories[i],
+                'velocity': self.velocities[i].copy(),
+            })
         return active
-    
+
     @staticmethod
     def _bbox_center(bbox: List[float]) -> Tuple[float, float]:
         """Calcula centro do bbox"""
         x1, y1, x2, y2 = bbox
         return ((x1 + x2) / 2, (y1 + y2) / 2)
-    
-    @staticmethod
-    def _calculate_iou(bbox1: List[float], bbox2: List[float]) -> float:
-        """Calcula Intersection over Union entre dois bboxes"""
-        x1_1, y1_1, x2_1, y2_1 = bbox1
-        x1_2, y1_2, x2_2, y2_2 = bbox2
-        
-        # Calcular interseção
-        x1_i = max(x1_1, x1_2)
-        y1_i = max(y1_1, y1_2)
-        x2_i = min(x2_1, x2_2)
-        y2_i = min(y2_1, y2_2)
-        
-        if x2_i < x1_i or y2_i < y1_i:
-            return 0.0
-        
-        intersection = (x2_i - x1_i) * (y2_i - y1_i)
-        
-        # Calcular união
-        area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
-        area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
-        union = area1 + area2 - intersection
-        
-        return intersection / union if union > 0 else 0.0
-
 
 class ObjectDetector:
     """Detector de objetos usando YOLOv8"""
+
+    # Resolução de inferência (largura, altura): redimensionar uma vez com
+    # cv2.resize é mais barato que o letterbox interno da Ultralytics sobre
+    # o frame cheio; os bboxes são reescalados de volta
+    INFERENCE_SIZE = (640, 384)
     
-    def __init__(self, model_name: str = 'yolov8n.pt', confidence: float = 0.5):
+    def __init__(self, model_name: str = 'yolov8n.pt', confidence: float = 0.5,
+                 use_tensorrt: bool = False):
         """
         Inicializa detector
-        
+
         Args:
-            model_name: Nome do modelo YOLO
+            model_name: Nome do modelo YOLO (.pt, .engine ou .onnx)
             confidence: Confiança mínima para detecção
+            use_tensorrt: Exportar/carregar engine TensorRT FP16 (requer GPU)
         """
+        if use_tensorrt and torch.cuda.is_available() and model_name.endswith('.pt'):
+            # Compilar uma vez para TensorRT (fusão de camadas + tensor
+            # cores); o .engine fica cacheado ao lado do .pt
+            engine_path = model_name[:-3] + '.engine'
+            if not os.path.exists(engine_path):
+                YOLO(model_name).export(format='engine', half=True,
+                                        dynamic=False, imgsz=640)
+            model_name = engine_path
+
         self.model = YOLO(model_name)
         self.confidence = confidence
         self.tracker = ObjectTracker()
+
+        # FP16 em GPU: metade da banda de memória na forward pass
+        # (o .engine já embute FP16 e reside na GPU)
+        self._use_half = torch.cuda.is_available()
+        if self._use_half and not model_name.endswith('.engine'):
+            self.model.to('cuda')
         
         # Classes COCO de interesse (pessoas e objetos comuns)
         self.target_classes = [0, 24, 26, 28, 39, 41, 67]  # person, backpack, handbag, suitcase, bottle, cup, cell phone
         self.class_names = self.model.names
+
+        # LUT de cores por ID: gerada uma vez com RNG local, sem tocar no
+        # estado global do NumPy a cada frame
+        self._color_lut = np.random.RandomState(0).randint(
+            0, 255, (1024, 3), dtype=np.uint8
+        )
+
+        # Cache de cv2.getTextSize por string de label: o tamanho só depende
+        # do texto (fonte e escala são fixas), e labels se repetem entre frames
+        self._label_size_cache = {}
         
     def detect_and_track(self, frame: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
         """
@@ -208,73 +303,157 @@ class ObjectDetector:
             frame_annotated: Frame com anotações
             tracks: Lista de tracks detectados
         """
-        # Detecção
-        results = self.model(frame, conf=self.confidence, classes=self.target_classes, verbose=False)
-        
+        # Detecção (em resolução reduzida; bboxes reescalados de volta)
+        small, scale = self._prepare_input(frame)
+        results = self.model(small, conf=self.confidence, classes=self.target_classes,
+                             verbose=False, half=self._use_half)
+
         # Extrair detecções
-        detections = []
-        if len(results) > 0 and results[0].boxes is not None:
-            boxes = results[0].boxes
-            for box in boxes:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                
-                detections.append({
-                    'bbox': [float(x1), float(y1), float(x2), float(y2)],
-                    'confidence': conf,
-                    'class_id': cls,
-                    'class_name': self.class_names[cls]
-                })
-        
+        detections = self._extract_detections(results[0], scale) if len(results) else []
+
         # Rastreamento
         tracks = self.tracker.update(detections)
-        
-        # Anotar frame
-        frame_annotated = self._annotate_frame(frame.copy(), tracks)
-        
+
+        # Anotar frame in place: sem memcpy de HxWx3 por frame
+        frame_annotated = self._annotate_frame(frame, tracks)
+
         return frame_annotated, tracks
-    
+
+    def detect_and_track_batch(self, frames: List[np.ndarray],
+                               detect_mask: Optional[List[bool]] = None
+                               ) -> List[Tuple[np.ndarray, List[Dict]]]:
+        """
+        Detecta e rastreia objetos em um lote de frames
+
+        Uma única forward pass da rede para o lote inteiro (amortiza o custo
+        fixo por chamada); o tracker continua sendo atualizado frame a frame
+        para manter a ordem temporal. Frames com detect_mask False pulam a
+        rede e apenas propagam os tracks pela velocidade.
+
+        Args:
+            frames: Lista de frames de vídeo (BGR), em ordem
+            detect_mask: Quais frames rodam detecção (padrão: todos)
+
+        Returns:
+            Lista de pares (frame_annotated, tracks), um por frame
+        """
+        if detect_mask is None:
+            detect_mask = [True] * len(frames)
+
+        prepared = [self._prepare_input(f)
+                    for f, d in zip(frames, detect_mask) if d]
+        results = iter(
+            self.model([p[0] for p in prepared], conf=self.confidence,
+                       classes=self.target_classes, verbose=False,
+                       half=self._use_half)
+            if prepared else ()
+        )
+        scales = iter(p[1] for p in prepared)
+
+        output = []
+        for frame, run_detection in zip(frames, detect_mask):
+            if run_detection:
+                detections = self._extract_detections(next(results), next(scales))
+                tracks = self.tracker.update(detections)
+            else:
+                tracks = self.tracker.predict()
+            output.append((self._annotate_frame(frame, tracks), tracks))
+
+        return output
+
+    def _prepare_input(self, frame: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Reduz o frame para a resolução de inferência
+
+        Retorna o frame reduzido e o fator de escala (x, y, x, y) para
+        reescalar bboxes, ou (frame, None) se o frame já é pequeno.
+        """
+        h, w = frame.shape[:2]
+        target_w, target_h = self.INFERENCE_SIZE
+        if w <= target_w and h <= target_h:
+            return frame, None
+
+        small = cv2.resize(frame, (target_w, target_h),
+                           interpolation=cv2.INTER_LINEAR)
+        scale = np.array([w / target_w, h / target_h,
+                          w / target_w, h / target_h], dtype=np.float32)
+        return small, scale
+
+    def _extract_detections(self, result,
+                            scale: Optional[np.ndarray] = None) -> List[Dict]:
+        """Converte um resultado YOLO em lista de detecções"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return []
+
+        # Uma única transferência GPU->CPU por tensor, em vez de um sync
+        # por box dentro do loop
+        xyxy = boxes.xyxy.cpu().numpy()
+        if scale is not None:
+            xyxy = xyxy * scale  # de volta à resolução original
+        confs = boxes.conf.cpu().numpy()
+        classes = boxes.cls.cpu().numpy().astype(int)
+
+        return [
+            {
+                'bbox': xyxy[i].tolist(),
+                'confidence': float(confs[i]),
+                'class_id': int(classes[i]),
+                'class_name': self.class_names[int(classes[i])]
+            }
+            for i in range(len(classes))
+        ]
+
     def _annotate_frame(self, frame: np.ndarray, tracks: List[Dict]) -> np.ndarray:
         """Anota frame com bounding boxes e IDs"""
+        # Trajetórias agrupadas por cor: uma chamada de polylines por cor,
+        # em vez de uma por track
+        trajectories = {}
+
         for track in tracks:
             x1, y1, x2, y2 = map(int, track['bbox'])
             track_id = track['id']
             class_name = self.class_names[track['class_id']]
             confidence = track['confidence']
-            
+
             # Cor baseada no ID
             color = self._get_color(track_id)
-            
+
             # Desenhar bbox
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            
-            # Label
+
+            # Label (tamanho memoizado por string: labels se repetem entre frames)
             label = f"ID:{track_id} {class_name} {confidence:.2f}"
-            label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
-            
+            label_size = self._label_size_cache.get(label)
+            if label_size is None:
+                label_size = self._label_size_cache[label] = cv2.getTextSize(
+                    label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2
+                )[0]
+
             # Background do label
-            cv2.rectangle(frame, 
+            cv2.rectangle(frame,
                          (x1, y1 - label_size[1] - 10),
                          (x1 + label_size[0], y1),
                          color, -1)
-            
+
             # Texto
             cv2.putText(frame, label, (x1, y1 - 5),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-            
-            # Desenhar trajetória
+
+            # Coletar trajetória (array int32 direto do ring buffer)
             if len(track['history']) > 1:
-                points = np.array(list(track['history']), dtype=np.int32)
-                cv2.polylines(frame, [points], False, color, 2)
-        
+                trajectories.setdefault(color, []).append(
+                    track['history'].as_array()
+                )
+
+        for color, points_list in trajectories.items():
+            cv2.polylines(frame, points_list, False, color, 2)
+
         return frame
     
-    @staticmethod
-    def _get_color(track_id: int) -> Tuple[int, int, int]:
-        """Gera cor consistente para um ID"""
-        np.random.seed(track_id)
-        return tuple(map(int, np.random.randint(0, 255, 3)))
+    def _get_color(self, track_id: int) -> Tuple[int, int, int]:
+        """Retorna cor consistente para um ID (lookup na LUT pré-computada)"""
+        color = self._color_lut[track_id & 1023]
+        return (int(color[0]), int(color[1]), int(color[2]))
 
 
 if __name__ == "__main__":
@@ -6,10 +6,15 @@ Integra detecção, rastreamento, classificação e geração de relatórios
 import cv2
 import argparse
 import os
+import queue
+import shutil
+import subprocess
 import sys
+import threading
 import time
 from pathlib import Path
 import numpy as np
+import orjson
 from tqdm import tqdm
 from datetime import timedelta
 
@@ -19,47 +24,140 @@ from anomaly_detector import AnomalyDetector
 from report_generator import ReportGenerator
 
 
+class _FFmpegWriter:
+    """Writer de vídeo via pipe para o ffmpeg (encode por hardware)
+
+    Mesma interface write/release do cv2.VideoWriter, mas o encode roda no
+    processo do ffmpeg (NVENC/VideoToolbox/QSV), fora dos cores que fazem
+    rastreamento e anotação.
+    """
+
+    def __init__(self, output_path: str, fps: float, width: int, height: int,
+                 codec: str):
+        self.proc = subprocess.Popen(
+            ['ffmpeg', '-y', '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+             '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+             '-c:v', codec, output_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+    def write(self, frame: np.ndarray):
+        self.proc.stdin.write(frame.tobytes())
+
+    def release(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+
+def _encoder_works(ffmpeg: str, codec: str) -> bool:
+    """Valida o encoder com um encode de teste de 1 frame
+
+    Aparecer em 'ffmpeg -encoders' só prova que o encoder foi compilado no
+    build, não que o hardware/driver existe (builds genéricos listam nvenc
+    em máquinas sem GPU). Sem esta checagem o ffmpeg morreria no primeiro
+    write do pipe.
+    """
+    try:
+        proc = subprocess.run(
+            [ffmpeg, '-hide_banner', '-loglevel', 'error',
+             '-f', 'lavfi', '-i', 'color=black:size=128x128:rate=30',
+             '-frames:v', '1', '-c:v', codec, '-f', 'null', '-'],
+            capture_output=True, timeout=15
+        )
+        return proc.returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def _create_video_writer(output_path: str, fps: float, width: int, height: int):
+    """Cria writer de vídeo, preferindo encoder por hardware via ffmpeg
+
+    Sem ffmpeg ou sem encoder de hardware funcional, cai no
+    cv2.VideoWriter (mp4v por software), como antes.
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        try:
+            encoders = subprocess.run(
+                [ffmpeg, '-hide_banner', '-encoders'],
+                capture_output=True, text=True, timeout=10
+            ).stdout
+        except (OSError, subprocess.SubprocessError):
+            encoders = ''
+
+        for codec in ('h264_nvenc', 'h264_videotoolbox', 'h264_qsv'):
+            if codec in encoders and _encoder_works(ffmpeg, codec):
+                return _FFmpegWriter(output_path, fps, width, height, codec)
+
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+
 class VideoAnalyzer:
     """Analisador completo de vídeo"""
     
-    def __init__(self, confidence: float = 0.5, output_dir: str = 'output'):
+    def __init__(self, confidence: float = 0.5, output_dir: str = 'output',
+                 use_tensorrt: bool = False):
         """
         Inicializa analisador
-        
+
         Args:
             confidence: Confiança mínima para detecção
             output_dir: Diretório de saída
+            use_tensorrt: Usar engine TensorRT para inferência (requer GPU)
         """
-        self.detector = ObjectDetector(confidence=confidence)
+        self.detector = ObjectDetector(confidence=confidence,
+                                       use_tensorrt=use_tensorrt)
         self.classifier = None  # Será inicializado com FPS do vídeo
         self.anomaly_detector = None  # Será inicializado com FPS do vídeo
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
         
-        # Dados de análise
+        # Dados de análise (apenas agregados; os dados por frame são
+        # transmitidos para frames.jsonl em vez de acumulados em memória)
         self.analysis_data = {
-            'frames_data': [],
             'detection_stats': {'frames': [], 'object_counts': []},
             'tracks_info': {}
         }
+        self._frames_jsonl_path = os.path.join(output_dir, 'frames.jsonl')
+        # Buffer de 1 MiB: uma linha pequena por frame viraria um syscall
+        # por frame com o buffer padrão de 8 KiB
+        self._frames_jsonl = open(self._frames_jsonl_path, 'wb',
+                                  buffering=1 << 20)
+
+        # Cache de cv2.getTextSize por label de atividade (são só 5 strings
+        # possíveis; a medição se repetiria milhares de vezes por vídeo)
+        self._label_size_cache = {}
     
-    def analyze_video(self, video_path: str, show_video: bool = False, 
-                     save_video: bool = True, generate_report: bool = True):
+    def analyze_video(self, video_path: str, show_video: bool = False,
+                     save_video: bool = True, generate_report: bool = True,
+                     batch_size: int = 8, detect_every: int = 1):
         """
         Analisa vídeo completo
-        
+
         Args:
             video_path: Caminho do vídeo
             show_video: Exibir processamento em tempo real
             save_video: Salvar vídeo processado
             generate_report: Gerar relatório PDF
+            batch_size: Frames por lote de inferência YOLO
+            detect_every: Rodar YOLO a cada N frames; nos demais os tracks
+                são propagados pela velocidade (subamostragem temporal)
         """
         print(f"\n{'='*60}")
         print(f"ANÁLISE DE VÍDEO - Sistema de Detecção de Anomalias")
         print(f"{'='*60}\n")
         
-        # Abrir vídeo
-        cap = cv2.VideoCapture(video_path)
+        # Abrir vídeo com backend FFmpeg e decodificação acelerada por
+        # hardware quando disponível (NVDEC/VAAPI/...); a propriedade só
+        # tem efeito se passada na abertura (set() depois é no-op). Sem
+        # hardware, o OpenCV cai de volta no decoder de software sem erro
+        cap = cv2.VideoCapture(
+            video_path, cv2.CAP_FFMPEG,
+            [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        )
         if not cap.isOpened():
             print(f"Erro: Não foi possível abrir o vídeo {video_path}")
             return
@@ -88,9 +186,8 @@ class VideoAnalyzer:
                 self.output_dir,
                 f"processed_{os.path.basename(video_path)}"
             )
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            video_writer = cv2.VideoWriter(
-                output_video_path, fourcc, fps, (width, height)
+            video_writer = _create_video_writer(
+                output_video_path, fps, width, height
             )
         
         # Processar vídeo
@@ -98,49 +195,119 @@ class VideoAnalyzer:
         start_time = time.time()
         
         print("🔄 Processando vídeo...")
-        progress_bar = tqdm(total=total_frames, desc="Frames", unit="frame")
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            timestamp = frame_number / fps
-            
-            # 1. Detecção e rastreamento
-            frame_annotated, tracks = self.detector.detect_and_track(frame)
-            
-            # 2. Classificação de atividades
-            activities = self.classifier.classify(tracks, frame_number)
-            
-            # 3. Detecção de anomalias
-            anomalies = self.anomaly_detector.detect(
-                tracks, activities, frame_number, timestamp
-            )
-            
-            # 4. Anotar frame com informações adicionais
-            frame_annotated = self._annotate_frame(
-                frame_annotated, tracks, activities, anomalies, frame_number, timestamp
-            )
-            
-            # 5. Salvar dados
-            self._save_frame_data(frame_number, tracks, activities, anomalies)
-            
-            # 6. Exibir/salvar
-            if show_video:
-                cv2.imshow('Video Analysis', frame_annotated)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    print("\n⚠️  Análise interrompida pelo usuário")
+        # mininterval/smoothing reduzem o custo do tqdm; o update é feito
+        # uma vez por lote processado, não por frame
+        progress_bar = tqdm(total=total_frames, desc="Frames", unit="frame",
+                            mininterval=0.5, maxinterval=2.0, smoothing=0)
+        
+        # Pipeline produtor/consumidor: decodificação e escrita rodam em
+        # threads próprias (o GIL é liberado dentro do FFmpeg/OpenCV),
+        # sobrepondo-se à inferência; filas limitadas seguram a memória
+        decode_queue = queue.Queue(maxsize=2 * batch_size)
+        stop_event = threading.Event()
+
+        def _decode_worker():
+            while not stop_event.is_set():
+                ret, decoded = cap.read()
+                if not ret:
                     break
-            
-            if video_writer:
-                video_writer.write(frame_annotated)
-            
-            frame_number += 1
-            progress_bar.update(1)
-        
+                decode_queue.put(decoded)
+            decode_queue.put(None)  # sentinela de fim de stream
+
+        decode_thread = threading.Thread(target=_decode_worker, daemon=True)
+        decode_thread.start()
+
+        write_queue = None
+        writer_thread = None
+        if video_writer:
+            write_queue = queue.Queue(maxsize=2 * batch_size)
+
+            def _write_worker():
+                while True:
+                    item = write_queue.get()
+                    if item is None:
+                        break
+                    video_writer.write(item)
+
+            writer_thread = threading.Thread(target=_write_worker, daemon=True)
+            writer_thread.start()
+
+        batch_frames = []
+        detect_mask = []
+        stream_index = 0
+        interrupted = False
+        end_of_stream = False
+
+        while not interrupted and not end_of_stream:
+            frame = decode_queue.get()
+            if frame is None:
+                end_of_stream = True
+            else:
+                batch_frames.append(frame)
+                detect_mask.append(stream_index % detect_every == 0)
+                stream_index += 1
+                # Acumular até fechar o lote (amortiza o custo fixo por
+                # chamada da rede); o resto do pipeline segue frame a frame
+                if len(batch_frames) < batch_size:
+                    continue
+
+            if batch_frames:
+                # 1. Detecção (uma forward pass para o lote) e rastreamento;
+                # frames fora da cadência só propagam tracks por velocidade
+                batch_results = self.detector.detect_and_track_batch(
+                    batch_frames, detect_mask
+                )
+                batch_frames = []
+                detect_mask = []
+
+                for frame_annotated, tracks in batch_results:
+                    timestamp = frame_number / fps
+
+                    # 2. Classificação de atividades
+                    activities = self.classifier.classify(tracks, frame_number)
+
+                    # 3. Detecção de anomalias
+                    anomalies = self.anomaly_detector.detect(
+                        tracks, activities, frame_number, timestamp
+                    )
+
+                    # 4. Anotar frame com informações adicionais
+                    frame_annotated = self._annotate_frame(
+                        frame_annotated, tracks, activities, anomalies,
+                        frame_number, timestamp
+                    )
+
+                    # 5. Salvar dados
+                    self._save_frame_data(frame_number, tracks, activities, anomalies)
+
+                    # 6. Exibir/salvar
+                    if show_video:
+                        cv2.imshow('Video Analysis', frame_annotated)
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            print("\n⚠️  Análise interrompida pelo usuário")
+                            interrupted = True
+                            break
+
+                    if write_queue:
+                        write_queue.put(frame_annotated)
+
+                    frame_number += 1
+
+                progress_bar.update(frame_number - progress_bar.n)
+
         progress_bar.close()
-        
+
+        # Encerrar as threads do pipeline
+        stop_event.set()
+        if interrupted:
+            # Drenar a fila para desbloquear o decoder até a sentinela
+            while decode_queue.get() is not None:
+                pass
+        decode_thread.join()
+        if writer_thread:
+            write_queue.put(None)
+            writer_thread.join()
+
         # Liberar recursos
         cap.release()
         if video_writer:
@@ -158,6 +325,9 @@ class VideoAnalyzer:
         print(f"🚀 FPS de processamento: {processing_fps:.2f}")
         print(f"{'='*60}\n")
         
+        # Fechar o stream de dados por frame
+        self._frames_jsonl.close()
+
         # Compilar estatísticas
         self._compile_statistics(video_path, fps, duration, total_frames)
         
@@ -169,10 +339,12 @@ class VideoAnalyzer:
             # Salvar JSON
             json_path = report_gen.save_json_data(self.analysis_data)
             print(f"   💾 Dados JSON salvos em: {json_path}")
+            print(f"   💾 Dados por frame em: {self._frames_jsonl_path}")
             
             # Gerar PDF
             pdf_path = report_gen.generate_report(video_path, self.analysis_data)
             print(f"   📋 Relatório PDF gerado: {pdf_path}")
+            report_gen.close()
         
         # Resumo
         self._print_summary()
@@ -185,14 +357,10 @@ class VideoAnalyzer:
                        activities: dict, anomalies: list,
                        frame_number: int, timestamp: float) -> np.ndarray:
         """Adiciona anotações extras ao frame"""
-        height, width = frame.shape[:2]
-        
-        # Overlay de informações
-        overlay = frame.copy()
-        
-        # Painel de informações (topo)
-        cv2.rectangle(overlay, (0, 0), (width, 80), (0, 0, 0), -1)
-        frame = cv2.addWeighted(frame, 0.7, overlay, 0.3, 0)
+        # Painel de informações (topo): escurecer só a ROI do painel em vez
+        # de copiar e mesclar o frame inteiro
+        roi = frame[0:80]
+        cv2.addWeighted(roi, 0.7, np.zeros_like(roi), 0.3, 0, dst=roi)
         
         # Informações do frame
         time_str = str(timedelta(seconds=int(timestamp)))
@@ -217,11 +385,14 @@ class VideoAnalyzer:
             activity_label = activity.replace('_', ' ')
             label_y = y2 + 20
             
-            # Background do label
-            label_size, _ = cv2.getTextSize(
-                activity_label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2
-            )
-            cv2.rectangle(frame, 
+            # Background do label (tamanho memoizado por string)
+            label_size = self._label_size_cache.get(activity_label)
+            if label_size is None:
+                label_size = self._label_size_cache[activity_label] = \
+                    cv2.getTextSize(
+                        activity_label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2
+                    )[0]
+            cv2.rectangle(frame,
                          (x1, label_y - label_size[1] - 5),
                          (x1 + label_size[0], label_y),
                          (0, 255, 0), -1)
@@ -276,7 +447,11 @@ class VideoAnalyzer:
             ]
         }
         
-        self.analysis_data['frames_data'].append(frame_data)
+        # Um registro JSON por linha, serializado com orjson (bem mais
+        # rápido que o json da stdlib e sem reter os dicts em memória)
+        self._frames_jsonl.write(
+            orjson.dumps(frame_data, option=orjson.OPT_SERIALIZE_NUMPY) + b'\n'
+        )
         self.analysis_data['detection_stats']['frames'].append(frame_number)
         self.analysis_data['detection_stats']['object_counts'].append(len(tracks))
     
@@ -368,7 +543,14 @@ Exemplos de uso:
                        help='Salvar vídeo processado')
     parser.add_argument('--generate-report', action='store_true',
                        help='Gerar relatório PDF')
-    
+    parser.add_argument('--batch-size', type=int, default=8,
+                       help='Frames por lote de inferência YOLO (padrão: 8)')
+    parser.add_argument('--tensorrt', action='store_true',
+                       help='Exportar/usar engine TensorRT FP16 (requer GPU)')
+    parser.add_argument('--detect-every', type=int, default=1,
+                       help='Rodar YOLO a cada N frames, propagando tracks '
+                            'nos demais (padrão: 1 = todos)')
+
     args = parser.parse_args()
     
     # Verificar entrada
@@ -379,7 +561,8 @@ Exemplos de uso:
     # Criar analisador
     analyzer = VideoAnalyzer(
         confidence=args.confidence,
-        output_dir=args.output
+        output_dir=args.output,
+        use_tensorrt=args.tensorrt
     )
     
     # Analisar vídeo
@@ -388,7 +571,9 @@ Exemplos de uso:
             video_path=args.input,
             show_video=args.show_video,
             save_video=args.save_video,
-            generate_report=args.generate_report
+            generate_report=args.generate_report,
+            batch_size=args.batch_size,
+            detect_every=args.detect_every
         )
     except KeyboardInterrupt:
         print("\n\n⚠️  Análise interrompida pelo usuário")
@@ -3,11 +3,15 @@ Módulo de Geração de Relatórios
 Cria relatórios em PDF com estatísticas e visualizações
 """
 
+import io
 import os
-import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
 from datetime import datetime
 from typing import Dict, List
 import numpy as np
+import orjson
 import matplotlib
 matplotlib.use('Agg')  # Backend não-interativo
 import matplotlib.pyplot as plt
@@ -20,10 +24,208 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.platypus.flowables import KeepTogether
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 
+# Estilo global dos gráficos, aplicado uma vez no import: set_style muta
+# os rcParams globais, não precisa rodar por instância
+sns.set_style("whitegrid")
+
+@lru_cache(maxsize=256)
+def _prettify(s: str) -> str:
+    """Converte NOME_DE_TIPO em 'Nome De Tipo' (memoizado: os mesmos
+    rótulos aparecem em tabelas, gráficos e legendas)"""
+    return s.replace('_', ' ').title()
+
+
+# Descrições dos tipos de anomalia (constante de módulo: o dict era
+# reconstruído a cada chamada de _get_anomaly_description)
+_ANOMALY_DESC = {
+    'MOVIMENTO_SUBITO': 'Aceleração repentina',
+    'VELOCIDADE_ANORMAL': 'Velocidade excessiva',
+    'PARADA_PROLONGADA': 'Imobilidade prolongada',
+    'AGLOMERACAO': 'Múltiplas pessoas próximas',
+    'MOVIMENTO_REVERSO': 'Retorno ao ponto inicial',
+    'OBJETO_ABANDONADO': 'Objeto deixado no local',
+    'DIRECAO_PROIBIDA': 'Movimento não esperado'
+}
+
+# Paleta do relatório, compartilhada entre as instâncias e os estilos
+# de tabela construídos no corpo da classe
+_PALETTE = {
+    'primary': '#2E86AB',
+    'secondary': '#A23B72',
+    'success': '#06D6A0',
+    'warning': '#F18F01',
+    'danger': '#C73E1D'
+}
+
+# Figuras matplotlib reutilizadas entre relatórios, uma por processo:
+# criar uma Figure paga a inicialização completa de Artists; limpar os
+# Axes não. Cada worker do pool de renderização mantém o próprio cache.
+_FIG_CACHE = {}
+
+
+def _get_cached_fig(key: str, figsize):
+    """Retorna o par (Figure, Axes) cacheado para um tipo de gráfico"""
+    fig_ax = _FIG_CACHE.get(key)
+    if fig_ax is None:
+        fig_ax = _FIG_CACHE[key] = plt.subplots(figsize=figsize)
+        # Layout fixo definido uma vez: dispensa o bbox_inches='tight'
+        # do savefig, que força uma segunda renderização só para medir
+        fig_ax[0].subplots_adjust(left=0.1, right=0.95, top=0.92, bottom=0.1)
+    fig, ax = fig_ax
+    ax.clear()
+    return fig, ax
+
+
+def _fig_to_png(fig) -> bytes:
+    """Serializa a figura como PNG em memória (sem ida e volta ao disco);
+    bytes atravessam a fronteira do pool de processos sem custo extra"""
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=100)
+    return buf.getvalue()
+
+
+def _render_detection_timeline(detection_stats: Dict,
+                               primary_color: str) -> bytes:
+    """Renderiza o gráfico de linha da detecção (função de módulo para que
+    possa ser executada em um processo do pool); retorna os bytes do PNG"""
+    try:
+        fig, ax = _get_cached_fig('detection_timeline', figsize=(10, 6))
+
+        frames = detection_stats.get('frames', [])
+        counts = detection_stats.get('object_counts', [])
+
+        if frames and counts:
+            ax.plot(frames, counts, color=primary_color, linewidth=2)
+            ax.fill_between(frames, counts, alpha=0.3, color=primary_color)
+
+            ax.set_xlabel('Frame', fontsize=12)
+            ax.set_ylabel('Número de Objetos Detectados', fontsize=12)
+            ax.set_title('Objetos Detectados ao Longo do Tempo', fontsize=14, fontweight='bold')
+            ax.grid(True, alpha=0.3)
+
+            return _fig_to_png(fig)
+    except Exception as e:
+        print(f"Erro ao gerar gráfico de timeline: {e}")
+
+    return None
+
+
+def _render_activity_distribution(activity_counts: Dict) -> bytes:
+    """Renderiza o gráfico de pizza da distribuição de atividades"""
+    # Pizza com menos de duas fatias (ou só zeros) não informa nada:
+    # pular evita todo o pipeline do matplotlib
+    if len(activity_counts) < 2 or sum(activity_counts.values()) == 0:
+        return None
+
+    try:
+        fig, ax = _get_cached_fig('activity_distribution', figsize=(8, 8))
+
+        labels = [_prettify(k) for k in activity_counts.keys()]
+        sizes = list(activity_counts.values())
+        colors_list = plt.cm.Set3(range(len(labels)))
+
+        wedges, texts, autotexts = ax.pie(
+            sizes, labels=labels, autopct='%1.1f%%',
+            colors=colors_list, startangle=90
+        )
+
+        for autotext in autotexts:
+            autotext.set_color('white')
+            autotext.set_fontweight('bold')
+
+        ax.set_title('Distribuição de Atividades', fontsize=14, fontweight='bold')
+
+        return _fig_to_png(fig)
+    except Exception as e:
+        print(f"Erro ao gerar gráfico de distribuição: {e}")
+
+    return None
+
+
+def _render_anomaly_timeline(anomaly_stats: Dict) -> bytes:
+    """Renderiza o gráfico de timeline das anomalias"""
+    try:
+        timeline = anomaly_stats.get('timeline', [])
+        if not timeline:
+            return None
+
+        fig, ax = _get_cached_fig('anomaly_timeline', figsize=(10, 6))
+
+        # Tipos e timestamps como arrays; np.unique devolve o índice de
+        # linha (y) de cada evento, sem agrupar em listas Python
+        types = np.array([item['type'] for item in timeline])
+        ts = np.fromiter((item['timestamp'] for item in timeline),
+                         dtype=np.float64, count=len(timeline))
+        uniq, inv = np.unique(types, return_inverse=True)
+        labels = [_prettify(t) for t in uniq]
+
+        # Um único scatter (uma PathCollection) para todos os eventos,
+        # em vez de um artist por tipo
+        cmap = plt.cm.tab10
+        ax.scatter(ts, inv, c=inv, cmap=cmap, vmin=0,
+                   vmax=max(len(uniq) - 1, 1), s=100, alpha=0.6)
+
+        ax.set_xlabel('Tempo (segundos)', fontsize=12)
+        ax.set_ylabel('Tipo de Anomalia', fontsize=12)
+        ax.set_title('Timeline de Anomalias Detectadas', fontsize=14, fontweight='bold')
+        ax.set_yticks(range(len(uniq)))
+        ax.set_yticklabels(labels)
+        denom = max(len(uniq) - 1, 1)
+        ax.legend(handles=[
+            plt.Line2D([], [], marker='o', linestyle='', alpha=0.6,
+                       color=cmap(i / denom), label=label)
+            for i, label in enumerate(labels)
+        ], loc='upper right')
+        ax.grid(True, alpha=0.3, axis='x')
+
+        return _fig_to_png(fig)
+    except Exception as e:
+        print(f"Erro ao gerar timeline de anomalias: {e}")
+
+    return None
+
 
 class ReportGenerator:
     """Gerador de relatórios de análise de vídeo"""
-    
+
+    # Estilos de tabela construídos uma vez na definição da classe:
+    # TableStyle interpreta cada tupla de comando a cada construção e é
+    # imutável depois de pronto, então é seguro compartilhar entre relatórios
+    _VIDEO_INFO_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(_PALETTE['primary'])),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+    ])
+    _ACTIVITY_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(_PALETTE['primary'])),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+    ])
+    _SEVERITY_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(_PALETTE['danger'])),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+    ])
+    _TYPE_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(_PALETTE['warning'])),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (1, -1), 'CENTER'),
+        ('ALIGN', (2, 0), (2, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP')
+    ])
+
     def __init__(self, output_dir: str):
         """
         Inicializa gerador de relatórios
@@ -34,15 +236,46 @@ class ReportGenerator:
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
         
-        # Estilo
-        sns.set_style("whitegrid")
-        self.colors = {
-            'primary': '#2E86AB',
-            'secondary': '#A23B72',
-            'success': '#06D6A0',
-            'warning': '#F18F01',
-            'danger': '#C73E1D'
-        }
+        self.colors = _PALETTE
+
+        # Pool de processos para renderizar os gráficos em paralelo
+        # (matplotlib é CPU-bound; processos contornam o GIL), criado
+        # sob demanda na primeira geração de relatório
+        self._executor = None
+
+        # Estilos ReportLab construídos uma vez: getSampleStyleSheet
+        # reconstrói todos os estilos padrão a cada chamada
+        self.styles = getSampleStyleSheet()
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=self.styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor(self.colors['primary']),
+            spaceAfter=30,
+            alignment=TA_CENTER
+        )
+        self.heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=self.styles['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor(self.colors['primary']),
+            spaceAfter=12,
+            spaceBefore=12
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=3)
+        return self._executor
+
+    def close(self):
+        """Libera as figuras cacheadas e encerra o pool de renderização"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for fig, _ in _FIG_CACHE.values():
+            plt.close(fig)
+        _FIG_CACHE.clear()
     
     def generate_report(self, video_path: str, analysis_data: Dict) -> str:
         """
@@ -57,31 +290,38 @@ class ReportGenerator:
         """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         pdf_path = os.path.join(self.output_dir, f"relatorio_{timestamp}.pdf")
-        
-        # Criar documento
-        doc = SimpleDocTemplate(pdf_path, pagesize=A4)
+
+        # Submeter os três gráficos antes de montar qualquer tabela: eles
+        # renderizam em paralelo no pool enquanto o texto é construído
+        # (cada um escreve em um PNG distinto, sem necessidade de lock)
+        detection_stats = analysis_data.get('detection_stats', {})
+        activity_stats = analysis_data.get('activity_stats', {})
+        anomaly_stats = analysis_data.get('anomaly_stats', {})
+        activity_counts = activity_stats.get('activity_counts', {})
+
+        executor = self._get_executor()
+        detection_fut = executor.submit(
+            _render_detection_timeline, detection_stats, self.colors['primary']
+        ) if detection_stats else None
+        activity_fut = executor.submit(
+            _render_activity_distribution, activity_counts
+        ) if len(activity_counts) >= 2 else None
+        anomaly_fut = executor.submit(
+            _render_anomaly_timeline, anomaly_stats
+        ) if anomaly_stats else None
+
+        # Criar documento (handle com buffer de 1 MiB: agrega as escritas
+        # pequenas do build em poucos syscalls)
+        pdf_file = open(pdf_path, 'wb', buffering=1 << 20)
+        doc = SimpleDocTemplate(pdf_file, pagesize=A4)
         story = []
-        styles = getSampleStyleSheet()
-        
-        # Estilos customizados
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor(self.colors['primary']),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor(self.colors['primary']),
-            spaceAfter=12,
-            spaceBefore=12
-        )
-        
+
+        # Estilos cacheados no __init__
+        styles = self.styles
+        title_style = self.title_style
+        heading_style = self.heading_style
+
+
         # Título
         story.append(Paragraph("Relatório de Análise de Vídeo", title_style))
         story.append(Paragraph(f"Inteligência Artificial e Visão Computacional", styles['Normal']))
@@ -98,15 +338,7 @@ class ReportGenerator:
         ]
         
         table = Table(video_info, colWidths=[2*inch, 4*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(self.colors['primary'])),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-        ]))
+        table.setStyle(self._VIDEO_INFO_STYLE)
         story.append(table)
         story.append(Spacer(1, 20))
         
@@ -124,78 +356,61 @@ class ReportGenerator:
         
         # Estatísticas de Detecção
         story.append(Paragraph("Estatísticas de Detecção e Rastreamento", heading_style))
-        detection_stats = analysis_data.get('detection_stats', {})
-        
-        if detection_stats:
+
+        if detection_fut is not None:
             # Gráfico de objetos detectados ao longo do tempo
-            fig_path = self._plot_detection_timeline(detection_stats)
-            if fig_path and os.path.exists(fig_path):
-                story.append(Image(fig_path, width=5*inch, height=3*inch))
+            png = detection_fut.result()
+            if png:
+                story.append(Image(io.BytesIO(png), width=5*inch, height=3*inch))
                 story.append(Spacer(1, 10))
         
         # Classificação de Atividades
         story.append(PageBreak())
         story.append(Paragraph("Classificação de Atividades", heading_style))
         
-        activity_stats = analysis_data.get('activity_stats', {})
         if activity_stats:
             story.append(Paragraph("Atividades Detectadas:", styles['Heading3']))
             story.append(Spacer(1, 10))
-            
-            # Tabela de atividades
-            activity_counts = activity_stats.get('activity_counts', {})
-            activity_data = [["Atividade", "Ocorrências", "Percentual"]]
-            total = sum(activity_counts.values())
-            
-            for activity, count in sorted(activity_counts.items(), key=lambda x: x[1], reverse=True):
-                percentage = (count / total * 100) if total > 0 else 0
-                activity_data.append([
-                    activity.replace('_', ' ').title(),
-                    str(count),
-                    f"{percentage:.1f}%"
-                ])
+
+            # Tabela de atividades (agregação e ordenação em uma passada NumPy)
+            keys = np.array(list(activity_counts))
+            vals = np.fromiter(activity_counts.values(), dtype=np.int64,
+                               count=len(activity_counts))
+            total = int(vals.sum())
+            order = np.argsort(-vals)
+
+            percentages = vals * (100.0 / total) if total > 0 else vals * 0.0
+            activity_data = [["Atividade", "Ocorrências", "Percentual"]] + [
+                [_prettify(activity), str(count),
+                 f"{percentages[i]:.1f}%"]
+                for activity, count, i in zip(keys[order], vals[order], order)
+            ]
             
             table = Table(activity_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(self.colors['primary'])),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-            ]))
+            table.setStyle(self._ACTIVITY_STYLE)
             story.append(table)
             story.append(Spacer(1, 20))
             
             # Gráfico de pizza
-            fig_path = self._plot_activity_distribution(activity_counts)
-            if fig_path and os.path.exists(fig_path):
-                story.append(Image(fig_path, width=4*inch, height=4*inch))
+            png = activity_fut.result() if activity_fut else None
+            if png:
+                story.append(Image(io.BytesIO(png), width=4*inch, height=4*inch))
         
         # Detecção de Anomalias
         story.append(PageBreak())
         story.append(Paragraph("Detecção de Anomalias", heading_style))
         
-        anomaly_stats = analysis_data.get('anomaly_stats', {})
         if anomaly_stats:
             # Estatísticas gerais
             by_severity = anomaly_stats.get('by_severity', {})
-            severity_data = [["Severidade", "Quantidade", "Cor"]]
-            
-            for severity in ['ALTA', 'MEDIA', 'BAIXA']:
-                count = by_severity.get(severity, 0)
-                color_map = {'ALTA': 'Vermelho', 'MEDIA': 'Amarelo', 'BAIXA': 'Verde'}
-                severity_data.append([severity, str(count), color_map[severity]])
+            color_map = {'ALTA': 'Vermelho', 'MEDIA': 'Amarelo', 'BAIXA': 'Verde'}
+            severity_data = [["Severidade", "Quantidade", "Cor"]] + [
+                [severity, str(by_severity.get(severity, 0)), color_map[severity]]
+                for severity in ('ALTA', 'MEDIA', 'BAIXA')
+            ]
             
             table = Table(severity_data, colWidths=[2*inch, 2*inch, 2*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(self.colors['danger'])),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-            ]))
+            table.setStyle(self._SEVERITY_STYLE)
             story.append(table)
             story.append(Spacer(1, 20))
             
@@ -205,166 +420,58 @@ class ReportGenerator:
                 story.append(Paragraph("Tipos de Anomalias Detectadas:", styles['Heading3']))
                 story.append(Spacer(1, 10))
                 
-                type_data = [["Tipo", "Quantidade", "Descrição"]]
-                for anom_type, count in sorted(by_type.items(), key=lambda x: x[1], reverse=True):
-                    desc = self._get_anomaly_description(anom_type)
-                    type_data.append([
-                        anom_type.replace('_', ' ').title(),
-                        str(count),
-                        desc
-                    ])
+                type_data = [["Tipo", "Quantidade", "Descrição"]] + [
+                    [_prettify(anom_type), str(count),
+                     _ANOMALY_DESC.get(anom_type, 'Evento atípico')]
+                    for anom_type, count in sorted(
+                        by_type.items(), key=lambda x: x[1], reverse=True
+                    )
+                ]
                 
                 table = Table(type_data, colWidths=[2*inch, 1*inch, 3*inch])
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(self.colors['warning'])),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (1, -1), 'CENTER'),
-                    ('ALIGN', (2, 0), (2, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP')
-                ]))
+                table.setStyle(self._TYPE_STYLE)
                 story.append(table)
                 story.append(Spacer(1, 20))
                 
                 # Timeline de anomalias
-                fig_path = self._plot_anomaly_timeline(anomaly_stats)
-                if fig_path and os.path.exists(fig_path):
-                    story.append(Image(fig_path, width=5*inch, height=3*inch))
+                png = anomaly_fut.result() if anomaly_fut else None
+                if png:
+                    story.append(Image(io.BytesIO(png), width=5*inch, height=3*inch))
         
         # Conclusões
         story.append(PageBreak())
         story.append(Paragraph("Conclusões e Insights", heading_style))
         
+        # Um único Paragraph com quebras <br/>: cada flowable tem custo de
+        # layout próprio no ReportLab, então N parágrafos viram um só
         conclusions = self._generate_conclusions(analysis_data)
-        for conclusion in conclusions:
-            story.append(Paragraph(f"• {conclusion}", styles['Normal']))
-            story.append(Spacer(1, 8))
-        
+        if conclusions:
+            body = "<br/><br/>".join(f"• {c}" for c in conclusions)
+            story.append(Paragraph(body, styles['Normal']))
+
+
         # Gerar PDF
         doc.build(story)
+        pdf_file.close()
         return pdf_path
     
-    def _plot_detection_timeline(self, detection_stats: Dict) -> str:
-        """Gera gráfico de linha da detecção ao longo do tempo"""
-        try:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            # Dados de exemplo (você deve adaptar conforme seus dados reais)
-            frames = detection_stats.get('frames', [])
-            counts = detection_stats.get('object_counts', [])
-            
-            if frames and counts:
-                ax.plot(frames, counts, color=self.colors['primary'], linewidth=2)
-                ax.fill_between(frames, counts, alpha=0.3, color=self.colors['primary'])
-                
-                ax.set_xlabel('Frame', fontsize=12)
-                ax.set_ylabel('Número de Objetos Detectados', fontsize=12)
-                ax.set_title('Objetos Detectados ao Longo do Tempo', fontsize=14, fontweight='bold')
-                ax.grid(True, alpha=0.3)
-                
-                plt.tight_layout()
-                
-                output_path = os.path.join(self.output_dir, 'detection_timeline.png')
-                plt.savefig(output_path, dpi=150, bbox_inches='tight')
-                plt.close()
-                
-                return output_path
-        except Exception as e:
-            print(f"Erro ao gerar gráfico de timeline: {e}")
-        
-        return None
-    
-    def _plot_activity_distribution(self, activity_counts: Dict) -> str:
-        """Gera gráfico de pizza da distribuição de atividades"""
-        try:
-            fig, ax = plt.subplots(figsize=(8, 8))
-            
-            labels = [k.replace('_', ' ').title() for k in activity_counts.keys()]
-            sizes = list(activity_counts.values())
-            colors_list = plt.cm.Set3(range(len(labels)))
-            
-            wedges, texts, autotexts = ax.pie(
-                sizes, labels=labels, autopct='%1.1f%%',
-                colors=colors_list, startangle=90
-            )
-            
-            for autotext in autotexts:
-                autotext.set_color('white')
-                autotext.set_fontweight('bold')
-            
-            ax.set_title('Distribuição de Atividades', fontsize=14, fontweight='bold')
-            
-            plt.tight_layout()
-            
-            output_path = os.path.join(self.output_dir, 'activity_distribution.png')
-            plt.savefig(output_path, dpi=150, bbox_inches='tight')
-            plt.close()
-            
-            return output_path
-        except Exception as e:
-            print(f"Erro ao gerar gráfico de distribuição: {e}")
-        
-        return None
-    
-    def _plot_anomaly_timeline(self, anomaly_stats: Dict) -> str:
-        """Gera gráfico de timeline das anomalias"""
-        try:
-            timeline = anomaly_stats.get('timeline', [])
-            if not timeline:
-                return None
-            
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            # Agrupar por tipo
-            by_type = {}
-            for item in timeline:
-                anom_type = item['type']
-                timestamp = item['timestamp']
-                
-                if anom_type not in by_type:
-                    by_type[anom_type] = []
-                by_type[anom_type].append(timestamp)
-            
-            # Plotar
-            for i, (anom_type, timestamps) in enumerate(by_type.items()):
-                ax.scatter(timestamps, [i] * len(timestamps), 
-                          label=anom_type.replace('_', ' ').title(),
-                          s=100, alpha=0.6)
-            
-            ax.set_xlabel('Tempo (segundos)', fontsize=12)
-            ax.set_ylabel('Tipo de Anomalia', fontsize=12)
-            ax.set_title('Timeline de Anomalias Detectadas', fontsize=14, fontweight='bold')
-            ax.set_yticks(range(len(by_type)))
-            ax.set_yticklabels([k.replace('_', ' ').title() for k in by_type.keys()])
-            ax.legend(loc='upper right')
-            ax.grid(True, alpha=0.3, axis='x')
-            
-            plt.tight_layout()
-            
-            output_path = os.path.join(self.output_dir, 'anomaly_timeline.png')
-            plt.savefig(output_path, dpi=150, bbox_inches='tight')
-            plt.close()
-            
-            return output_path
-        except Exception as e:
-            print(f"Erro ao gerar timeline de anomalias: {e}")
-        
-        return None
-    
+    def _plot_detection_timeline(self, detection_stats: Dict) -> bytes:
+        """Gera gráfico de linha da detecção ao longo do tempo (bytes PNG)"""
+        return _render_detection_timeline(detection_stats,
+                                          self.colors['primary'])
+
+    def _plot_activity_distribution(self, activity_counts: Dict) -> bytes:
+        """Gera gráfico de pizza da distribuição de atividades (bytes PNG)"""
+        return _render_activity_distribution(activity_counts)
+
+    def _plot_anomaly_timeline(self, anomaly_stats: Dict) -> bytes:
+        """Gera gráfico de timeline das anomalias (bytes PNG)"""
+        return _render_anomaly_timeline(anomaly_stats)
+
     @staticmethod
     def _get_anomaly_description(anomaly_type: str) -> str:
         """Retorna descrição de um tipo de anomalia"""
-        descriptions = {
-            'MOVIMENTO_SUBITO': 'Aceleração repentina',
-            'VELOCIDADE_ANORMAL': 'Velocidade excessiva',
-            'PARADA_PROLONGADA': 'Imobilidade prolongada',
-            'AGLOMERACAO': 'Múltiplas pessoas próximas',
-            'MOVIMENTO_REVERSO': 'Retorno ao ponto inicial',
-            'OBJETO_ABANDONADO': 'Objeto deixado no local',
-            'DIRECAO_PROIBIDA': 'Movimento não esperado'
-        }
-        return descriptions.get(anomaly_type, 'Evento atípico')
+        return _ANOMALY_DESC.get(anomaly_type, 'Evento atípico')
     
     def _generate_conclusions(self, analysis_data: Dict) -> List[str]:
         """Gera conclusões automáticas baseadas nos dados"""
@@ -377,10 +484,13 @@ class ReportGenerator:
         # Análise de atividades
         activity_counts = activity_stats.get('activity_counts', {})
         if activity_counts:
-            most_common = max(activity_counts, key=activity_counts.get)
+            # itemgetter em vez de key=dict.get: uma passada sobre os pares,
+            # sem re-hash de cada chave
+            most_common, most_common_count = max(activity_counts.items(),
+                                                 key=itemgetter(1))
             conclusions.append(
                 f"A atividade mais frequente detectada foi '{most_common.replace('_', ' ')}', "
-                f"representando {activity_counts[most_common]} ocorrências."
+                f"representando {most_common_count} ocorrências."
             )
         
         # Análise de anomalias
@@ -424,10 +534,16 @@ class ReportGenerator:
     def save_json_data(self, data: Dict, filename: str = 'analysis_data.json'):
         """Salva dados da análise em JSON"""
         output_path = os.path.join(self.output_dir, filename)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
+
+        # orjson serializa em uma chamada (encoder nativo; com indent o
+        # json da stdlib cai no encoder puro-Python) e já aceita tipos NumPy
+        with open(output_path, 'wb', buffering=1 << 20) as f:
+            f.write(orjson.dumps(
+                data,
+                option=(orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS |
+                        orjson.OPT_SERIALIZE_NUMPY)
+            ))
+
         return output_path
 
 
@@ -0,0 +1,65 @@
+"""
+Buffer circular pré-alocado para históricos por track
+Evita realocações e cópias de deque nos caminhos quentes de análise
+"""
+
+import numpy as np
+
+
+class RingBuf1D:
+    """Buffer circular de códigos int8 com tamanho fixo"""
+
+    __slots__ = ('buf', 'idx', 'count')
+
+    def __init__(self, size: int):
+        self.buf = np.empty(size, dtype=np.int8)
+        self.idx = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, value: int):
+        """Adiciona um código, sobrescrevendo o mais antigo quando cheio"""
+        self.buf[self.idx] = value
+        self.idx = (self.idx + 1) % self.buf.shape[0]
+        if self.count < self.buf.shape[0]:
+            self.count += 1
+
+    def as_array(self) -> np.ndarray:
+        """Retorna o conteúdo em ordem cronológica (view quando possível)"""
+        if self.count < self.buf.shape[0]:
+            return self.buf[:self.count]
+        if self.idx == 0:
+            return self.buf
+        return np.concatenate((self.buf[self.idx:], self.buf[:self.idx]))
+
+
+class RingBuf2D:
+    """Buffer circular de pares (x, y) com tamanho fixo (float32 por padrão)"""
+
+    __slots__ = ('buf', 'idx', 'count')
+
+    def __init__(self, size: int, dtype=np.float32):
+        self.buf = np.empty((size, 2), dtype=dtype)
+        self.idx = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, x: float, y: float):
+        """Adiciona um par, sobrescrevendo o mais antigo quando cheio"""
+        self.buf[self.idx, 0] = x
+        self.buf[self.idx, 1] = y
+        self.idx = (self.idx + 1) % self.buf.shape[0]
+        if self.count < self.buf.shape[0]:
+            self.count += 1
+
+    def as_array(self) -> np.ndarray:
+        """Retorna o conteúdo em ordem cronológica (view quando possível)"""
+        if self.count < self.buf.shape[0]:
+            return self.buf[:self.count]
+        if self.idx == 0:
+            return self.buf
+        return np.concatenate((self.buf[self.idx:], self.buf[:self.idx]))